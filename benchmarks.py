@@ -0,0 +1,545 @@
+'''
+Micro-benchmarks for the Study Buddy pipeline.
+Usage: python benchmarks.py <name> [args]   (run without args to list benchmarks)
+'''
+
+import json
+import logging
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict
+
+
+class _MockChatHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible /v1/chat/completions stand-in for the inference provider."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    # simulated per-connection setup cost (TCP + TLS handshake to a remote provider)
+    connect_delay_s = 0.02
+
+    def setup(self):
+        time.sleep(self.connect_delay_s)
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    # reply text and, for stream=True requests, the delay between streamed words
+    reply = "# Summary\n- mock"
+    word_delay_s = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if request.get("stream"):
+            return self._stream()
+        body = json.dumps({
+            "id": "mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "mock",
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": self.reply}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        """Server-sent events, one word per event, over chunked transfer encoding."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send(data: str):
+            event = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(event):x}\r\n".encode("ascii") + event + b"\r\n")
+            self.wfile.flush()
+
+        for i, word in enumerate(self.reply.split(" ")):
+            time.sleep(self.word_delay_s)
+            send(json.dumps({
+                "id": "mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": "mock",
+                "choices": [{"index": 0, "finish_reason": None, "delta": {"role": "assistant", "content": word if i == 0 else " " + word}}],
+            }))
+        send("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _FlakyChatHandler(_MockChatHandler):
+    """
+    Mock endpoint that injects provider errors: 429 + Retry-After whenever more than
+    `capacity` requests are in flight (a concurrency quota), plus random 503s.
+    """
+    connect_delay_s = 0.0
+    capacity = 4
+    error_rate = 0.1
+    retry_after_s = 0.2
+    latency_s = 0.02
+    _in_flight = 0
+    _lock = threading.Lock()
+    _rng = random.Random(0)
+
+    def _reject(self, status: int, headers: Dict[str, str]):
+        body = b'{"error": "injected"}'
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        cls = type(self)
+        with cls._lock:
+            cls._in_flight += 1
+            over = cls._in_flight > cls.capacity
+            fail = cls._rng.random() < cls.error_rate
+        try:
+            if over:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reject(429, {"Retry-After": str(cls.retry_after_s)})
+            elif fail:
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                self._reject(503, {})
+            else:
+                time.sleep(cls.latency_s)
+                super().do_POST()
+        finally:
+            with cls._lock:
+                cls._in_flight -= 1
+
+
+def start_mock_server(handler=_MockChatHandler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def bench_client_pool(n: int = 50):
+    """Latency of repeated summarize_text calls: cold connection per call vs pooled client."""
+    server, url = start_mock_server()
+    import info_sum
+    info_sum.DEFAULT_BASE_URL = url
+    info_sum.HF_TOKEN = info_sum.HF_TOKEN or "mock"
+
+    def run(cold: bool) -> float:
+        info_sum.close_clients()
+        t0 = time.perf_counter()
+        for i in range(n):
+            if cold:
+                info_sum.close_clients()
+            info_sum.summarize_text(f"batch {i}", use_cache=False)
+        return (time.perf_counter() - t0) / n
+
+    cold = run(cold=True)
+    pooled = run(cold=False)
+    server.shutdown()
+    print(f"client_pool: {n} calls")
+    print(f"  cold client per call: {cold * 1000:.2f} ms/call")
+    print(f"  pooled client:        {pooled * 1000:.2f} ms/call ({cold / pooled:.1f}x)")
+
+
+def bench_retry(n: int = 200, workers: int = 16):
+    """Batches completed against a throttling, flaky endpoint: single attempt vs the rate limiter."""
+    from concurrent.futures import ThreadPoolExecutor
+    import info_sum
+    from rate_limit import RateLimiter
+
+    server, url = start_mock_server(_FlakyChatHandler)
+    info_sum.DEFAULT_BASE_URL = url
+    info_sum.HF_TOKEN = info_sum.HF_TOKEN or "mock"
+    info_sum.close_clients()
+
+    def run(limiter: RateLimiter):
+        info_sum._limiter = limiter
+
+        def one(i):
+            try:
+                info_sum.summarize_text(f"batch {i}", use_cache=False)
+                return True
+            except Exception:
+                return False
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            ok = sum(pool.map(one, range(n)))
+        return ok, time.perf_counter() - t0, limiter.stats()
+
+    logging.disable(logging.ERROR)
+    try:
+        single = run(RateLimiter(max_concurrency=workers, max_retries=0))
+        limited = run(RateLimiter(max_concurrency=workers, max_retries=8, backoff_base_s=0.05, backoff_max_s=2.0))
+    finally:
+        logging.disable(logging.NOTSET)
+        info_sum._limiter = None
+        server.shutdown()
+
+    print(f"retry: {n} calls from {workers} threads; endpoint allows {_FlakyChatHandler.capacity} in flight, {_FlakyChatHandler.error_rate:.0%} random 503s")
+    for name, (ok, secs, st) in (("single attempt", single), ("rate limiter", limited)):
+        print(f"  {name:<15} {ok}/{n} succeeded in {secs:.2f}s  retries={st['retries']} throttled={st['throttled']} final concurrency={st['concurrency']}")
+
+
+def bench_first_output(n_files: int = 6, chunks_per_file: int = 12):
+    """Time to the first exported per-file summary and to the first streamed combined token vs the full run."""
+    import connector
+    import info_sum
+    from file_storage import StorageManager
+
+    class _SlowHandler(_MockChatHandler):
+        connect_delay_s = 0.0
+        reply = " ".join(["note"] * 40)
+        word_delay_s = 0.005
+
+        def do_POST(self):
+            time.sleep(0.15)  # time to first token of a real provider
+            super().do_POST()
+
+    server, url = start_mock_server(_SlowHandler)
+    info_sum.DEFAULT_BASE_URL = url
+    info_sum.HF_TOKEN = info_sum.HF_TOKEN or "mock"
+    info_sum.close_clients()
+    # every call must reach the mock provider
+    info_sum.CACHE_ENABLED, info_sum._cache = False, None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saved_storage = connector.storage
+        connector.storage = StorageManager(base_dir=tmp)
+        file_ids = []
+        for f in range(n_files):
+            fid = connector.storage.save_file_record(f"lecture{f}.pdf", 1)["file_id"]
+            connector.storage.save_chunks(fid, ({"text": f"Lecture {f} point {i}. " * 150, "meta": {"chunk_idx": i, "page": i + 1}} for i in range(chunks_per_file)))
+            file_ids.append(fid)
+
+        marks: Dict[str, float] = {}
+        t0 = time.perf_counter()
+        logging.disable(logging.INFO)
+        try:
+            connector.summarize_multiple_files(
+                file_ids, max_workers=4, reuse=False,
+                on_file_done=lambda res: marks.setdefault("first_file", time.perf_counter() - t0),
+                on_delta=lambda piece: marks.setdefault("first_token", time.perf_counter() - t0),
+            )
+        finally:
+            logging.disable(logging.NOTSET)
+            connector.storage.close()
+            connector.storage = saved_storage
+            server.shutdown()
+        total = time.perf_counter() - t0
+
+    print(f"first_output: {n_files} files x {chunks_per_file} chunks, mock provider with 150 ms to first token")
+    print(f"  full run (old time to first output): {total:.2f}s")
+    print(f"  first per-file summary exported:     {marks['first_file']:.2f}s")
+    print(f"  first combined-summary token:        {marks['first_token']:.2f}s")
+
+
+def _synthetic_chunks(n: int):
+    for i in range(n):
+        text = f"Chunk {i} about topic {i % 97}. " * 20
+        yield {"text": text, "meta": {"source": "synthetic.pdf", "type": "pdf", "page": i // 4 + 1, "chunk_idx": i % 4, "excerpt": text[:200]}}
+
+
+def _legacy_save_chunks(db_path: str, file_id: int, chunks, per_call: int = 500):
+    """The original write path: a fresh connection per save_chunks call and one INSERT per row."""
+    batch = []
+    for ch in chunks:
+        batch.append(ch)
+        if len(batch) >= per_call:
+            _legacy_save_batch(db_path, file_id, batch)
+            batch = []
+    if batch:
+        _legacy_save_batch(db_path, file_id, batch)
+
+
+def _legacy_save_batch(db_path: str, file_id: int, chunks):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    for ch in chunks:
+        meta = ch["meta"]
+        c.execute(
+            "INSERT INTO chunks (file_id, chunk_idx, text, meta_json, page) VALUES (?, ?, ?, ?, ?)",
+            (file_id, meta["chunk_idx"], ch["text"], json.dumps(meta, ensure_ascii=False), meta["page"]),
+        )
+    conn.commit()
+    conn.close()
+
+
+def _legacy_save_summary(db_path: str, file_id: int, text: str):
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO summaries (file_id, summary_text, created_at) VALUES (?, ?, ?)", (file_id, text, time.time()))
+    conn.commit()
+    conn.close()
+
+
+def bench_storage_writes(n: int = 100_000, small: int = 2_000):
+    """
+    Legacy write path vs one WAL connection per thread, on two workloads:
+    n chunks through save_chunks (bulk: JSON encoding and the chunks index dominate,
+    and save_chunks also adds every batch to the full-text index, which the legacy
+    rows skip, so it comes out somewhat slower) and `small` one-row transactions like
+    save_summary/mark_ingested (where connection reuse and WAL commits pay off).
+    """
+    from file_storage import StorageManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = StorageManager(base_dir=f"{tmp}/legacy")
+        legacy.close()
+        # undo the new pragmas so the legacy path runs with sqlite's defaults
+        conn = sqlite3.connect(str(legacy.db_path))
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        t0 = time.perf_counter()
+        _legacy_save_chunks(str(legacy.db_path), 1, _synthetic_chunks(n))
+        legacy_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for i in range(small):
+            _legacy_save_summary(str(legacy.db_path), 1, f"summary {i}")
+        legacy_small_s = time.perf_counter() - t0
+
+        storage = StorageManager(base_dir=f"{tmp}/new")
+        t0 = time.perf_counter()
+        storage.save_chunks(1, _synthetic_chunks(n))
+        new_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for i in range(small):
+            storage.save_summary(1, f"summary {i}")
+        new_small_s = time.perf_counter() - t0
+        storage.close()
+
+    print(f"storage_writes: {n} chunks, {small} single-row transactions")
+    print(f"  legacy (connection per call, row INSERTs): {n / legacy_s:,.0f} chunks/s, {small / legacy_small_s:,.0f} txn/s")
+    print(f"  WAL connection + executemany batches:    {n / new_s:,.0f} chunks/s ({legacy_s / new_s:.1f}x), {small / new_small_s:,.0f} txn/s ({legacy_small_s / new_small_s:.1f}x)")
+
+
+def bench_chunk_lookup(n: int = 1_000_000, n_files: int = 1000, lookups: int = 200):
+    """query_chunks_by_file latency on an n-chunk database, with and without the schema indexes."""
+    import random
+    from file_storage import StorageManager
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = StorageManager(base_dir=tmp)
+        conn = storage._conn()
+        per_file = max(1, n // n_files)
+        # interleave files so each file's rows are spread across the table, as with real uploads
+        rows = ((i % n_files + 1, i // n_files, f"chunk {i}", "{}", None) for i in range(n_files * per_file))
+        with conn:
+            conn.executemany("INSERT INTO chunks (file_id, chunk_idx, text, meta_json, page) VALUES (?, ?, ?, ?, ?)", rows)
+        ids = [random.randint(1, n_files) for _ in range(lookups)]
+
+        def timed() -> float:
+            t0 = time.perf_counter()
+            for fid in ids:
+                storage.query_chunks_by_file(fid)
+            return (time.perf_counter() - t0) / lookups
+
+        indexed = timed()
+        conn.execute("DROP INDEX idx_chunks_file_chunk")
+        unindexed = timed()
+        storage.close()
+
+    print(f"chunk_lookup: {n_files * per_file:,} chunks across {n_files} files, {lookups} lookups")
+    print(f"  no index:                   {unindexed * 1000:.2f} ms/lookup")
+    print(f"  (file_id, chunk_idx) index: {indexed * 1000:.2f} ms/lookup ({unindexed / indexed:.0f}x)")
+
+
+def _legacy_chunk_text(text: str, max_words: int = 200, overlap_sentences: int = 0):
+    """The original per-sentence chunk_text, kept as the reference implementation."""
+    from resource_intake import ResourceIntake
+
+    if not text:
+        return []
+    sentences = ResourceIntake._sentence_split(text)
+    chunks = []
+    cur_sentences = []
+    cur_words = 0
+    for sent in sentences:
+        w = len(sent.split())
+        if cur_words + w <= max_words or not cur_sentences:
+            cur_sentences.append(sent)
+            cur_words += w
+        else:
+            chunks.append(" ".join(cur_sentences).strip())
+            if overlap_sentences and overlap_sentences < len(cur_sentences):
+                cur_sentences = cur_sentences[-overlap_sentences:].copy()
+            else:
+                cur_sentences = []
+            cur_words = sum(len(s.split()) for s in cur_sentences)
+            cur_sentences.append(sent)
+            cur_words += w
+    if cur_sentences:
+        chunks.append(" ".join(cur_sentences).strip())
+    return chunks
+
+
+def bench_chunk_text(megabytes: int = 4):
+    """ResourceIntake.chunk_text vs the original implementation on a multi-megabyte paragraph."""
+    import random
+    from resource_intake import ResourceIntake
+
+    rng = random.Random(0)
+    words = ["lecture", "entropy", "theorem", "proof", "graph", "vector", "matrix", "the", "of", "a"]
+    parts, size = [], 0
+    while size < megabytes * 1024 * 1024:
+        sent = " ".join(rng.choice(words) for _ in range(rng.randint(3, 30))) + rng.choice(".!?")
+        parts.append(sent)
+        size += len(sent) + 1
+    text = " ".join(parts)
+
+    print(f"chunk_text: {size / 1024 / 1024:.1f} MB, {len(parts):,} sentences")
+    for max_words, overlap in ((200, 0), (200, 2), (2000, 50)):
+        t0 = time.perf_counter()
+        old = _legacy_chunk_text(text, max_words, overlap)
+        old_s = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        new = ResourceIntake.chunk_text(text, max_words, overlap)
+        new_s = time.perf_counter() - t0
+        assert old == new, "chunk_text output differs from the reference implementation"
+        print(f"  max_words={max_words:<5} overlap={overlap:<3} original {old_s:.3f}s  single-pass {new_s:.3f}s ({old_s / new_s:.1f}x), identical output")
+
+
+def bench_backend(n: int = 2000):
+    """Pipeline throughput (chunks/second through batching and the reduce tree) on the offline stub backend."""
+    import connector
+    import info_sum
+
+    info_sum.DEFAULT_BACKEND, info_sum._backend = "stub", None
+    info_sum.CACHE_ENABLED, info_sum._cache = False, None
+    texts = [f"Slide {i}: " + " ".join(f"term{(i * 7 + j) % 503}" for j in range(120)) for i in range(n)]
+
+    print(f"backend: {n} chunks of 120 words, SUMMARIZER_BACKEND=stub (no network, no model)")
+    logging.disable(logging.INFO)
+    try:
+        for workers in (1, 4, 16):
+            stats: Dict[str, object] = {}
+            t0 = time.perf_counter()
+            connector.summarize_large_text(texts, max_workers=workers, memoize=False, stats=stats)
+            dt = time.perf_counter() - t0
+            print(f"  max_workers={workers:<3} {dt:.3f}s  {n / dt:,.0f} chunks/s  {stats['llm_calls']} calls over levels {stats['levels']}")
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def _legacy_markdown_pdf(md_path: str) -> str:
+    """The original try_make_pdf_from_markdown: re-imports and rebuilds the converter per document."""
+    from pathlib import Path
+    out_pdf = str(Path(md_path).with_suffix(".pdf"))
+    try:
+        import pypandoc
+        pypandoc.convert_file(md_path, "pdf", outputfile=out_pdf)
+        return out_pdf
+    except Exception:
+        pass
+    try:
+        import markdown
+        from weasyprint import HTML
+        html = markdown.markdown(Path(md_path).read_text(encoding="utf-8"), extensions=["fenced_code", "tables"])
+        HTML(string=html).write_pdf(out_pdf)
+        return out_pdf
+    except Exception:
+        return ""
+
+
+def bench_markdown_export(n: int = 40):
+    """Documents/second for Markdown -> PDF: per-call setup vs one long-lived MarkdownRenderer."""
+    from export_utils import MarkdownRenderer, write_markdown
+
+    renderer = MarkdownRenderer()
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = [
+            write_markdown(
+                f"# Lecture {i}\n\n" + "\n".join(f"## Section {s}\n- point {s}.{k} about entropy and proofs" for s in range(6) for k in range(4))
+                + "\n\n| term | meaning |\n|---|---|\n| a | b |\n",
+                tmp, f"doc{i}",
+            )
+            for i in range(n)
+        ]
+        logging.disable(logging.INFO)
+        try:
+            renderer.render(paths[0])
+            if renderer.backend == "none":
+                print("markdown_export: no PDF backend (pandoc or weasyprint) available")
+                return
+            t0 = time.perf_counter()
+            legacy = [_legacy_markdown_pdf(p) for p in paths]
+            legacy_s = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            batch = renderer.render_many(paths)
+            batch_s = time.perf_counter() - t0
+        finally:
+            logging.disable(logging.NOTSET)
+
+    print(f"markdown_export: {n} documents, backend {renderer.backend}")
+    print(f"  per-call setup:     {legacy_s:.2f}s  {sum(map(bool, legacy)) / legacy_s:.1f} docs/s")
+    print(f"  MarkdownRenderer:   {batch_s:.2f}s  {sum(map(bool, batch)) / batch_s:.1f} docs/s")
+
+
+def bench_metrics_overhead(n: int = 1_000_000):
+    """Cost per instrumented block with PIPELINE_METRICS off and on."""
+    import metrics
+
+    def _loop():
+        t0 = time.perf_counter()
+        for _ in range(n):
+            with metrics.span("bench", type="x"):
+                pass
+            metrics.inc("bench_items")
+        return (time.perf_counter() - t0) / n * 1e9
+
+    def _bare():
+        t0 = time.perf_counter()
+        for _ in range(n):
+            pass
+        return (time.perf_counter() - t0) / n * 1e9
+
+    was = metrics.ENABLED
+    try:
+        bare = _bare()
+        metrics.enable(False)
+        off = _loop()
+        metrics.enable(True)
+        on = _loop()
+    finally:
+        metrics.enable(was)
+        metrics.reset()
+    print(f"metrics_overhead: {n:,} spans + counter increments")
+    print(f"  empty loop:       {bare:.0f} ns/iteration")
+    print(f"  metrics disabled: {off - bare:.0f} ns/iteration")
+    print(f"  metrics enabled:  {on - bare:.0f} ns/iteration")
+
+
+BENCHMARKS: Dict[str, Callable[..., None]] = {
+    "client_pool": bench_client_pool,
+    "retry": bench_retry,
+    "first_output": bench_first_output,
+    "storage_writes": bench_storage_writes,
+    "chunk_lookup": bench_chunk_lookup,
+    "chunk_text": bench_chunk_text,
+    "backend": bench_backend,
+    "markdown_export": bench_markdown_export,
+    "metrics_overhead": bench_metrics_overhead,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print("Usage: python benchmarks.py <benchmark> [n]")
+        print("Available:", ", ".join(sorted(BENCHMARKS)))
+        return
+    args = [int(a) for a in sys.argv[2:]]
+    BENCHMARKS[sys.argv[1]](*args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,40 @@
+import hashlib
+import json
 import logging
-from typing import List, Dict, Any, Tuple
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple, Callable, Optional
 import time
 
 from file_storage import StorageManager
-from info_sum import summarize_text
+from info_sum import summarize_text, build_system_prompt, request_key, model_identity, get_cache
+from summarizer_backends import DEFAULT_BACKEND
+import extractive
+import token_budget
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 storage = StorageManager(base_dir="data", reset_db_on_start=False)
 
+# Close batches on content-defined edges (see _content_boundary) so an edit only
+# changes the batches around it; costs extra, smaller batches, so off by default.
+DEFAULT_CONTENT_BOUNDARIES = os.getenv("SUMMARIZER_CONTENT_BOUNDARIES", "0") == "1"
+
+# Max LLM requests in flight per summarize call; 1 keeps the old serial behaviour.
+DEFAULT_MAX_WORKERS = int(os.getenv("SUMMARIZER_MAX_WORKERS", "4"))
+
+# Completion budget per summarize_text call.
+DEFAULT_MAX_TOKENS = 1500
+
+# Fraction of each chunk's words kept by the local extractive pass; unset = off.
+DEFAULT_EXTRACTIVE_RATIO = float(os.getenv("SUMMARIZER_EXTRACTIVE_RATIO", "0")) or None
+
+# Reduction tree over batch summaries: at most FAN_IN summaries per reduce call,
+# and at most MAX_DEPTH reduce levels (the last one merges whatever is left).
+DEFAULT_TREE_FAN_IN = int(os.getenv("SUMMARIZER_TREE_FAN_IN", "8"))
+DEFAULT_TREE_MAX_DEPTH = int(os.getenv("SUMMARIZER_TREE_MAX_DEPTH", "8"))
+
 def _make_provenance_chunk_text(chunks: List[Dict[str, Any]]) -> List[str]:
     out = []
     for ch in chunks:
@@ -21,8 +46,20 @@ def _make_provenance_chunk_text(chunks: List[Dict[str, Any]]) -> List[str]:
         out.append(header + "\n" + ch["text"])
     return out
 
-def _batch_texts_by_words(texts: List[str], max_words: int = 1200) -> List[str]:
-    """Batch list of texts into strings where each batch is approximately <= max_words words."""
+def _content_boundary(text: str) -> bool:
+    """
+    Content-defined batch edge, true for ~1 in 4 texts and decided by the text alone.
+    Batches that close on these edges line up again right after an edited chunk,
+    so the rest of the document maps to the same batches (and memoized summaries).
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=1).digest()[0] % 4 == 0
+
+
+def _batch_texts_by_words(texts: List[str], max_words: int = 1200, boundary: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """
+    Batch list of texts into strings where each batch is approximately <= max_words words.
+    boundary(text) -> True also closes a batch after text once it is half full.
+    """
     batches = []
     cur = []
     curw = 0
@@ -35,85 +72,342 @@ def _batch_texts_by_words(texts: List[str], max_words: int = 1200) -> List[str]:
             batches.append("\n\n".join(cur))
             cur = [t]
             curw = w
+        if boundary is not None and curw * 2 >= max_words and boundary(t):
+            batches.append("\n\n".join(cur))
+            cur = []
+            curw = 0
     if cur:
         batches.append("\n\n".join(cur))
     return batches
 
 
+def _make_batches(texts: List[str], *, output_format: str, batch_words: int, batch_tokens: Optional[int], max_tokens: int) -> List[str]:
+    """
+    Pack texts into LLM batches. With a local tokenizer (TOKENIZER_PATH) batches are
+    filled to batch_tokens, or by default to whatever the context window leaves after
+    the system prompt and max_tokens; otherwise they fall back to batch_words.
+    With SUMMARIZER_CONTENT_BOUNDARIES=1 batch edges are content-defined (see
+    _content_boundary) so they survive edits.
+    """
+    boundary = _content_boundary if DEFAULT_CONTENT_BOUNDARIES else None
+    tokenizer = token_budget.get_tokenizer()
+    if tokenizer is None:
+        if batch_tokens:
+            logger.warning("batch_tokens=%d ignored: no tokenizer (set TOKENIZER_PATH); batching by words", batch_tokens)
+        return _batch_texts_by_words(texts, max_words=batch_words, boundary=boundary)
+    if not batch_tokens:
+        batch_tokens = token_budget.batch_token_budget(build_system_prompt(output_format), max_tokens, tokenizer=tokenizer)
+    return token_budget.pack_by_tokens(texts, batch_tokens, tokenizer=tokenizer, boundary=boundary)
+
+
+def _run_ordered(func: Callable[[Any], Any], items: List[Any], max_workers: int) -> List[Tuple[Any, Exception]]:
+    """
+    Run func over items on a bounded thread pool.
+    Returns [(result, error)] in input order; exactly one of the pair is None.
+    """
+    def _call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    workers = max(1, min(max_workers, len(items)))
+    if workers == 1:
+        return [_call(it) for it in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_call, items))
+
+
+def _group_for_reduce(texts: List[str], *, fan_in: int, output_format: str, batch_words: int, batch_tokens: Optional[int], max_tokens: int) -> List[List[int]]:
+    """
+    Group consecutive summaries for one reduce call: within the same budget as the leaf
+    batches and at most fan_in each. Every group but the last holds at least two, so
+    each level shrinks; a trailing single summary is carried up as it is.
+    """
+    tokenizer = token_budget.get_tokenizer()
+    if tokenizer is None:
+        budget = batch_words
+        sizes = [len(t.split()) for t in texts]
+    else:
+        budget = batch_tokens or token_budget.batch_token_budget(build_system_prompt(output_format), max_tokens, tokenizer=tokenizer)
+        sizes = token_budget.count_tokens_batch(texts, tokenizer)
+
+    groups: List[List[int]] = []
+    cur: List[int] = []
+    cur_size = 0
+    for i, n in enumerate(sizes):
+        if cur and len(cur) >= 2 and (cur_size + n > budget or len(cur) >= fan_in):
+            groups.append(cur)
+            cur, cur_size = [], 0
+        cur.append(i)
+        cur_size += n
+        if DEFAULT_CONTENT_BOUNDARIES and len(cur) >= 2 and cur_size * 2 >= budget and _content_boundary(texts[i]):
+            groups.append(cur)
+            cur, cur_size = [], 0
+    if cur:
+        groups.append(cur)
+    return groups
+
+
 def summarize_large_text(
     texts: List[str],
     *,
     output_format: str = "markdown",
     batch_words: int = 1200,
     hierarchical_final: bool = True,
-    max_tokens: int = 1500,
-    temperature: float = 0.2
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    temperature: float = 0.2,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    batch_tokens: Optional[int] = None,
+    memoize: bool = True,
+    fan_in: int = DEFAULT_TREE_FAN_IN,
+    max_depth: int = DEFAULT_TREE_MAX_DEPTH,
+    stats: Optional[Dict[str, Any]] = None,
+    on_delta: Optional[Callable[[str], None]] = None
 ) -> Tuple[str, List[str]]:
     """
     Summarize a (potentially large) list of provenance-prefixed chunk strings.
     Returns (final_summary, batch_summaries_list).
     - texts: list[str], each element is "SOURCE: ...\\n<chunk text>"
     - batch_words: approximate words per batch
-    - hierarchical_final: whether to run a final summarize on concatenated batch summaries
+    - hierarchical_final: reduce the batch summaries to one root through a tree of summarize calls
+    - max_workers: max summarize calls in flight at each level (1 = serial)
+    - batch_tokens: token budget per batch when a tokenizer is configured (default: fill the context window)
+    - memoize: look identical batches and reduce inputs up in the LLM cache in one pass and skip their calls
+    - fan_in / max_depth: at most fan_in summaries per reduce call, at most max_depth reduce levels
+    - stats: if given, filled with batches / memo_hits / llm_calls / failed (LLM calls that raised) / levels (items per tree level) / depth / fan_in
+    - on_delta: called with each piece of the final summary as the model streams it
+      (once with the whole text when the root is reused or needs no LLM call)
     """
     if not texts:
         return "", []
 
-    batches = _batch_texts_by_words(texts, max_words=batch_words)
-    batch_summaries: List[str] = []
+    def _key(text):
+        return request_key(text, output_format=output_format, max_tokens=max_tokens, temperature=temperature)
 
-    for i, b in enumerate(batches):
-        try:
-            logger.info("Summarizing internal batch %d/%d", i + 1, len(batches))
-            s = summarize_text(b, output_format=output_format, max_tokens=max_tokens, temperature=temperature)
-            batch_summaries.append(s)
-        except Exception as e:
-            logger.exception("summarize_text failed for internal batch %d: %s", i, e)
+    # a reduce call merges at least two summaries, or the tree would never shrink
+    fan_in = max(2, fan_in)
+    counts = {"memo_hits": 0, "llm_calls": 0, "failed": 0}
+
+    streamed = [False]
+
+    def _run_level(inputs: List[str], level: int, is_root: bool = False) -> List[Tuple[str, Exception]]:
+        """
+        Summarize every input of one tree level concurrently; memoized inputs skip the LLM.
+        The root call streams its output to on_delta.
+        """
+        cache = get_cache() if memoize else None
+        keys = [_key(t) for t in inputs] if cache is not None else [None] * len(inputs)
+        memo = cache.get_many(keys) if cache is not None else {}
+        todo = [i for i, k in enumerate(keys) if k not in memo]
+        secs = [0.0] * len(inputs)
+
+        def _summarize_one(i):
+            logger.info("Summarizing level %d item %d/%d", level, i + 1, len(inputs))
+            bt = time.perf_counter()
+            try:
+                if is_root and on_delta is not None:
+                    streamed[0] = True
+                    pieces = []
+                    for piece in summarize_text(inputs[i], output_format=output_format, max_tokens=max_tokens, temperature=temperature, stream=True):
+                        pieces.append(piece)
+                        on_delta(piece)
+                    out = "".join(pieces)
+                else:
+                    out = summarize_text(inputs[i], output_format=output_format, max_tokens=max_tokens, temperature=temperature)
+            finally:
+                secs[i] = time.perf_counter() - bt
+            return out
+
+        t0 = time.perf_counter()
+        outcomes = dict(zip(todo, _run_ordered(_summarize_one, todo, max_workers)))
+        counts["memo_hits"] += len(inputs) - len(todo)
+        counts["llm_calls"] += len(todo)
+        # sum of per-call latencies is what the serial path would have taken
+        logger.info(
+            "Summarized level %d: %d items (%d reused from earlier runs) in %.2fs wall-clock (serial estimate %.2fs, max_workers=%d)",
+            level, len(inputs), len(inputs) - len(todo), time.perf_counter() - t0, sum(secs), max(1, min(max_workers, len(todo)))
+        )
+        return [outcomes.get(i, (memo.get(keys[i]), None)) for i in range(len(inputs))]
+
+    # level 0 (map): the chunk batches
+    batches = _make_batches(texts, output_format=output_format, batch_words=batch_words, batch_tokens=batch_tokens, max_tokens=max_tokens)
+    batch_summaries: List[str] = []
+    for i, (s, e) in enumerate(_run_level(batches, 0, is_root=len(batches) == 1)):
+        if e is not None:
+            logger.error("summarize_text failed for internal batch %d: %s", i, e, exc_info=e)
+            counts["failed"] += 1
             batch_summaries.append(f"[ERROR in internal batch {i}: {e}]")
+        else:
+            batch_summaries.append(s)
+    levels = [len(batches)]
 
-    if hierarchical_final and len(batch_summaries) > 1:
-        combined_for_final = "\n\n".join(batch_summaries)
-        try:
-            logger.info("Running hierarchical final summarize on %d batch summaries", len(batch_summaries))
-            final = summarize_text(combined_for_final, output_format=output_format, max_tokens=max_tokens, temperature=temperature)
-        except Exception as e:
-            logger.exception("final hierarchical summarize failed: %s", e)
-            final = combined_for_final 
-    else:
-        final = "\n\n".join(batch_summaries)
+    # levels 1..max_depth (reduce): group summaries within the batch budget until one root remains
+    current = batch_summaries
+    while hierarchical_final and len(current) > 1 and len(levels) <= max(1, max_depth):
+        last_level = len(levels) == max(1, max_depth)
+        if last_level:
+            groups = [list(range(len(current)))]
+        else:
+            groups = _group_for_reduce(current, fan_in=fan_in, output_format=output_format, batch_words=batch_words, batch_tokens=batch_tokens, max_tokens=max_tokens)
+        merged = [g for g in groups if len(g) > 1]
+        inputs = ["\n\n".join(current[j] for j in g) for g in merged]
+        reduced = {}
+        for g, inp, (s, e) in zip(merged, inputs, _run_level(inputs, len(levels), is_root=len(groups) == 1)):
+            if e is not None:
+                # keep the unreduced text so nothing is lost; the level above still shrinks it
+                logger.error("reduce summarize failed at level %d for items %d-%d: %s", len(levels), g[0], g[-1], e, exc_info=e)
+                counts["failed"] += 1
+                reduced[g[0]] = inp
+            else:
+                reduced[g[0]] = s
+        nxt = [reduced[g[0]] if len(g) > 1 else current[g[0]] for g in groups]
+        levels.append(len(groups))
+        current = nxt
+
+    final = current[0] if len(current) == 1 else "\n\n".join(current)
+    if on_delta is not None and not streamed[0]:
+        on_delta(final)
 
+    if stats is not None:
+        stats.update(
+            batches=len(batches), memo_hits=counts["memo_hits"], llm_calls=counts["llm_calls"], failed=counts["failed"],
+            levels=levels, depth=len(levels) - 1, fan_in=fan_in,
+        )
     return final, batch_summaries
 
 
-def summarize_file(file_id: int, *, output_format: str = "markdown", batch_words: int = 1200, hierarchical: bool = True) -> Dict[str, Any]:
+def _tree_info(stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {"levels": stats["levels"], "depth": stats["depth"], "fan_in": stats["fan_in"]}
+
+
+def _summary_params(**params) -> str:
+    """Settings a stored summary is reused under, including the model that wrote it."""
+    model, provider = model_identity()
+    return json.dumps(dict(params, model=model, provider=provider, backend=DEFAULT_BACKEND), sort_keys=True)
+
+
+def summarize_file(file_id: int, *, output_format: str = "markdown", batch_words: int = 1200, hierarchical: bool = True, max_workers: int = DEFAULT_MAX_WORKERS, reuse: bool = True, extractive_ratio: Optional[float] = DEFAULT_EXTRACTIVE_RATIO, skip_duplicates: bool = True, covered_file_ids: Optional[List[int]] = None, fan_in: int = DEFAULT_TREE_FAN_IN, max_depth: int = DEFAULT_TREE_MAX_DEPTH, on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    reuse=True returns the stored summary made with the same settings instead of calling the LLM.
+    extractive_ratio (0-1] first trims every chunk to its most central sentences locally.
+    skip_duplicates leaves out chunks marked as near-duplicates of a chunk in this file
+    or in covered_file_ids (files summarized alongside it).
+    fan_in / max_depth shape the reduction tree (see summarize_large_text).
+    on_delta receives the final summary piece by piece as it streams in.
+    """
     file_meta = storage.get_file_by_id(file_id)
     if not file_meta:
         raise ValueError("file not found")
 
-    chunks = storage.query_chunks_by_file(file_id)
+    # file_ids are content-addressed, so a stored summary of this file_id is still valid
+    skip_in = sorted({file_id, *(covered_file_ids or [])}) if skip_duplicates else None
+    params = _summary_params(output_format=output_format, batch_words=batch_words, hierarchical=hierarchical, extractive_ratio=extractive_ratio, skip_duplicates_in=skip_in, fan_in=fan_in, max_depth=max_depth)
+    if reuse:
+        prev = storage.get_latest_summary(file_id, params)
+        if prev:
+            logger.info("Reusing stored summary %d for file_id=%d", prev["id"], file_id)
+            if on_delta is not None:
+                on_delta(prev["summary_text"])
+            return {"file_id": file_id, "summary_id": prev["id"], "summary": prev["summary_text"], "batches": 0, "elapsed_s": 0.0, "reused": True}
+
+    chunks = storage.query_chunks_by_file(file_id, skip_duplicates_in=skip_in)
     if not chunks:
         return {"file_id": file_id, "summary": "", "note": "no chunks"}
+    duplicates_skipped = storage.count_chunks(file_id) - len(chunks) if skip_in else 0
+    if duplicates_skipped:
+        logger.info("Skipping %d near-duplicate chunks of file_id=%d", duplicates_skipped, file_id)
 
     prov_texts = _make_provenance_chunk_text(chunks)
 
+    report = None
+    if extractive_ratio:
+        full_texts = prov_texts
+        prov_texts = _make_provenance_chunk_text(extractive.compress_chunks(chunks, ratio=extractive_ratio))
+        report = extractive.volume_report(full_texts, prov_texts)
+        report["batches_before"] = len(_make_batches(full_texts, output_format=output_format, batch_words=batch_words, batch_tokens=None, max_tokens=DEFAULT_MAX_TOKENS))
+
     # Use summarize_large_text to safely handle large input
+    t0 = time.perf_counter()
+    llm_stats: Dict[str, Any] = {}
     final, batch_summaries = summarize_large_text(
         prov_texts,
         output_format=output_format,
         batch_words=batch_words,
-        hierarchical_final=hierarchical
+        hierarchical_final=hierarchical,
+        max_workers=max_workers,
+        fan_in=fan_in,
+        max_depth=max_depth,
+        stats=llm_stats,
+        on_delta=on_delta
     )
+    elapsed = time.perf_counter() - t0
+
+    # a summary with failed batches holds error text; don't let a later run reuse it
+    summary_id = None
+    if llm_stats["failed"]:
+        logger.warning("Not storing summary of file_id=%d: %d LLM calls failed", file_id, llm_stats["failed"])
+    else:
+        summary_id = storage.save_summary(file_id, final, params)
 
-    summary_id = storage.save_summary(file_id, final)
+    result = {"file_id": file_id, "summary_id": summary_id, "summary": final, "batches": len(batch_summaries), "elapsed_s": elapsed, "duplicates_skipped": duplicates_skipped, "batches_reused": llm_stats["memo_hits"], "llm_calls": llm_stats["llm_calls"], "failed": llm_stats["failed"], "tree": _tree_info(llm_stats)}
+    if report:
+        report["batches_after"] = len(batch_summaries)
+        logger.info(
+            "Extractive pass for file_id=%d: %d -> %d %s sent, %d -> %d batches",
+            file_id, report["before"], report["after"], report["unit"], report["batches_before"], report["batches_after"]
+        )
+        result["extractive"] = report
+    return result
 
-    return {"file_id": file_id, "summary_id": summary_id, "summary": final, "batches": len(batch_summaries)}
 
+def summarize_multiple_files(file_ids: List[int], *, output_format: str = "markdown", batch_words: int = 1200, hierarchical: bool = True, max_workers: int = DEFAULT_MAX_WORKERS, reuse: bool = True, extractive_ratio: Optional[float] = DEFAULT_EXTRACTIVE_RATIO, skip_duplicates: bool = True, fan_in: int = DEFAULT_TREE_FAN_IN, max_depth: int = DEFAULT_TREE_MAX_DEPTH, on_file_done: Optional[Callable[[Dict[str, Any]], None]] = None, on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """
+    on_file_done(result) is called as soon as each per-file summary is ready (from a
+    worker thread, in completion order), so callers can export it before the combined
+    pass; on_delta streams the combined summary.
+    """
+    # Files run concurrently and split the worker budget between them, so the
+    # total number of in-flight LLM requests stays bounded by max_workers.
+    file_workers = max(1, min(max_workers, len(file_ids)))
+    batch_workers = max(1, max_workers // file_workers)
 
-def summarize_multiple_files(file_ids: List[int], *, output_format: str = "markdown", batch_words: int = 1200, hierarchical: bool = True) -> Dict[str, Any]:
+    def _summarize_one(fid):
+        res = summarize_file(fid, output_format=output_format, batch_words=batch_words, hierarchical=hierarchical, max_workers=batch_workers, reuse=reuse, extractive_ratio=extractive_ratio, skip_duplicates=skip_duplicates, covered_file_ids=file_ids, fan_in=fan_in, max_depth=max_depth)
+        if on_file_done is not None:
+            try:
+                on_file_done(res)
+            except Exception:
+                logger.exception("on_file_done callback failed for file_id=%d", fid)
+        return res
+
+    t0 = time.perf_counter()
     per_file = []
-    for fid in file_ids:
-        res = summarize_file(fid, output_format=output_format, batch_words=batch_words, hierarchical=hierarchical)
+    for res, e in _run_ordered(_summarize_one, file_ids, file_workers):
+        if e is not None:
+            raise e
         per_file.append(res)
+    logger.info(
+        "Summarized %d files in %.2fs wall-clock (serial estimate %.2fs, max_workers=%d)",
+        len(file_ids), time.perf_counter() - t0, sum(f.get("elapsed_s", 0.0) for f in per_file), max_workers
+    )
+
+    combined = summarize_combined(per_file, output_format=output_format, batch_words=batch_words, hierarchical=hierarchical, max_workers=max_workers, reuse=reuse, extractive_ratio=extractive_ratio, skip_duplicates=skip_duplicates, fan_in=fan_in, max_depth=max_depth, on_delta=on_delta)
+    return {"per_file": per_file, "combined": combined}
+
+
+def summarize_combined(per_file: List[Dict[str, Any]], *, output_format: str = "markdown", batch_words: int = 1200, hierarchical: bool = True, max_workers: int = DEFAULT_MAX_WORKERS, reuse: bool = True, extractive_ratio: Optional[float] = DEFAULT_EXTRACTIVE_RATIO, skip_duplicates: bool = True, fan_in: int = DEFAULT_TREE_FAN_IN, max_depth: int = DEFAULT_TREE_MAX_DEPTH, on_delta: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+    """Combined summary over per-file results (summarize_file outputs, in document order)."""
+    file_ids = [f["file_id"] for f in per_file]
+    anchor_id = None if not file_ids else file_ids[0]
+    combined_params = _summary_params(output_format=output_format, batch_words=batch_words, hierarchical=hierarchical, extractive_ratio=extractive_ratio, skip_duplicates=skip_duplicates, fan_in=fan_in, max_depth=max_depth, combined=list(file_ids))
+    if reuse and anchor_id is not None:
+        prev = storage.get_latest_summary(anchor_id, combined_params)
+        if prev:
+            logger.info("Reusing stored combined summary %d", prev["id"])
+            if on_delta is not None:
+                on_delta(prev["summary_text"])
+            return {"summary_id": prev["id"], "summary": prev["summary_text"], "reused": True}
 
     combined_text_parts = []
     for f in per_file:
@@ -121,13 +415,24 @@ def summarize_multiple_files(file_ids: List[int], *, output_format: str = "markd
         name = file_meta.get("original_name", f"file_{f['file_id']}")
         combined_text_parts.append(f"=== DOCUMENT: {name} ===\n\n{f['summary']}")
 
+    combined_stats: Dict[str, Any] = {}
     combined_final, _ = summarize_large_text(
         combined_text_parts,
         output_format=output_format,
         batch_words=batch_words,
-        hierarchical_final=hierarchical
+        hierarchical_final=hierarchical,
+        max_workers=max_workers,
+        fan_in=fan_in,
+        max_depth=max_depth,
+        stats=combined_stats,
+        on_delta=on_delta
     )
 
-    combined_summary_id = storage.save_summary(None if not file_ids else file_ids[0], combined_final)
+    failed = combined_stats["failed"] + sum(f.get("failed", 0) for f in per_file)
+    combined_summary_id = None
+    if failed:
+        logger.warning("Not storing combined summary: %d LLM calls failed", failed)
+    else:
+        combined_summary_id = storage.save_summary(anchor_id, combined_final, combined_params)
 
-    return {"per_file": per_file, "combined": {"summary_id": combined_summary_id, "summary": combined_final}}
+    return {"summary_id": combined_summary_id, "summary": combined_final, "llm_calls": combined_stats["llm_calls"], "failed": failed, "tree": _tree_info(combined_stats)}
@@ -1,9 +1,14 @@
+import os
 import sys
 from pathlib import Path
-from processing import process_file_bytes, get_file_chunks
-from connector import summarize_multiple_files
-from export_utils import write_markdown, try_make_pdf_from_markdown, try_make_pdf_from_latex
+from processing import process_file_path, get_file_chunks, reset_storage
+from connector import summarize_file, summarize_combined, DEFAULT_MAX_WORKERS
+from export_utils import write_markdown, try_make_pdf_from_markdown, try_make_pdf_from_latex, LATEX_WORKERS
+from file_storage import StorageManager
+from pipeline import Pipeline, Stage
+import metrics
 import time
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,65 +16,129 @@ logger.setLevel(logging.INFO)
 
 EXPORT_DIR = "data/exports"
 
-def run(files):
-    processed_file_ids = []
+# Worker threads per pipeline stage and the number of files waiting between stages.
+# Extraction is CPU-bound, summarization waits on the LLM, export on xelatex.
+INTAKE_WORKERS = int(os.getenv("EXEC_INTAKE_WORKERS", "1"))
+SUMMARIZE_WORKERS = int(os.getenv("EXEC_SUMMARIZE_WORKERS", "2"))
+EXPORT_WORKERS = int(os.getenv("EXEC_EXPORT_WORKERS", str(LATEX_WORKERS)))
+QUEUE_SIZE = int(os.getenv("EXEC_QUEUE_SIZE", "4"))
+
+# pipeline stages print from their own threads
+_print_lock = threading.Lock()
+
+def run(files, stream=False, intake_workers=INTAKE_WORKERS, summarize_workers=SUMMARIZE_WORKERS, export_workers=EXPORT_WORKERS):
+    """
+    Ingest, summarize and export files as a pipeline: while one file is being
+    summarized the next is extracted and the previous one compiled. Each per-file
+    summary lands in EXPORT_DIR as soon as it is ready; the combined summary follows
+    once every file is done, streamed to the terminal with stream=True.
+    """
     out_format = 'latex'
-    for p in files:
-        p = Path(p)
-        print("Processing:", p)
-        b = p.read_bytes()
-        summary = process_file_bytes(b, p.name, content_type="")
-        if "file_id" in summary:
-            processed_file_ids.append(summary["file_id"])
-        else:
-            print("Failed to process:", p, summary)
+    storage = StorageManager(base_dir="data", reset_db_on_start=False)
+    t0 = time.perf_counter()
+    # summarizing files split the LLM worker budget, as in summarize_multiple_files
+    batch_workers = max(1, DEFAULT_MAX_WORKERS // max(1, summarize_workers))
+    file_ids = {}
+    seen_lock = threading.Lock()
+    seen = set()
 
-    if not processed_file_ids:
-        print("No files processed. Exiting.")
-        return
+    def intake(job):
+        idx, p = job
+        with _print_lock:
+            print("Processing:", p)
+        summary = process_file_path(str(p), p.name, content_type="")
+        if "file_id" not in summary or "error" in summary:
+            with _print_lock:
+                print("Failed to process:", p, summary)
+            return None
+        with seen_lock:
+            file_ids[idx] = summary["file_id"]
+        return idx, summary["file_id"]
 
-    # Summarize all processed files and produce a combined summary
-    res = summarize_multiple_files(processed_file_ids, output_format=out_format, batch_words=1200, hierarchical=True)
+    def summarize(job):
+        # items arrive in upload order, so every earlier file is already ingested
+        idx, fid = job
+        with seen_lock:
+            # identical uploads share a file_id; summarize them once
+            if fid in seen:
+                return None
+            seen.add(fid)
+            covered = [file_ids[i] for i in sorted(file_ids) if i <= idx]
+        return summarize_file(fid, output_format=out_format, batch_words=1200, hierarchical=True, max_workers=batch_workers, covered_file_ids=covered)
 
-    # Export per-file summaries
-    for per in res["per_file"]:
+    def export_file(per):
         fid = per["file_id"]
-        file_meta = None
-        try:
-            from file_storage import StorageManager
-            storage = StorageManager(base_dir="data", reset_db_on_start=False)
-            file_meta = storage.get_file_by_id(fid)
-        except Exception:
-            pass
+        file_meta = storage.get_file_by_id(fid)
         name = (file_meta and file_meta.get("original_name")) or f"file_{fid}"
-        safe_name = Path(name).stem
+        with _print_lock:
+            print(f"[{time.perf_counter() - t0:.1f}s] Summary ready for {name}")
+        _export(per["summary"], out_format, f"{Path(name).stem}_summary_{int(time.time())}", f"per-file summary for {name}")
+        return per
+
+    pipe = Pipeline(
+        [
+            Stage("intake", intake, intake_workers),
+            Stage("summarize", summarize, summarize_workers, ordered=True),
+            Stage("export", export_file, export_workers),
+        ],
+        queue_size=QUEUE_SIZE,
+    )
+    results = pipe.run([(i, Path(p)) for i, p in enumerate(files)])
+    per_file = [res for res, err in results if res is not None and res.get("summary")]
+    for (res, err), p in zip(results, files):
+        if err is not None:
+            print(f"Failed: {p}: {err}")
+    print(pipe.report())
+
+    if not per_file:
+        print("No files summarized. Exiting.")
+        return
+
+    on_delta = None
+    if stream:
+        started = []
+
+        def on_delta(piece):
+            if not started:
+                started.append(True)
+                print(f"[{time.perf_counter() - t0:.1f}s] Combined summary (streaming):")
+            print(piece, end="", flush=True)
+
+    combined = summarize_combined(per_file, output_format=out_format, batch_words=1200, hierarchical=True, on_delta=on_delta)
+    if stream:
+        print()
+
+    # Export combined
+    _export(combined["summary"], out_format, f"combined_summary_{int(time.time())}", "combined summary")
+    print(f"[{time.perf_counter() - t0:.1f}s] Done")
+    if metrics.ENABLED:
+        print("Metrics written to", " and ".join(metrics.write_files()))
+
+
+def _export(text, out_format, filename_prefix, label):
+    try:
         if out_format == 'markdown':
-            md_path = write_markdown(per["summary"], EXPORT_DIR, f"{safe_name}_summary_{int(time.time())}")
+            md_path = write_markdown(text, EXPORT_DIR, filename_prefix)
             pdf_path = try_make_pdf_from_markdown(md_path)
-            print(f"Exported per-file summary for {name}:")
-            print("  MD:", md_path)
-            print("  PDF:", pdf_path if pdf_path else "(PDF not created)")
+            lines = [f"Exported {label}:", f"  MD: {md_path}", f"  PDF: {pdf_path if pdf_path else '(PDF not created)'}"]
         elif out_format == 'latex':
-            try_make_pdf_from_latex(per["summary"], EXPORT_DIR, f'{safe_name}_summary_{int(time.time())}')
+            pdf_path = try_make_pdf_from_latex(text, EXPORT_DIR, filename_prefix)
+            lines = [f"Exported {label}: {pdf_path}"]
         else:
-            print('NOTHING GENERATED')
-
-    # Export combined
-    if out_format == 'markdown':
-        combined = res["combined"]["summary"]
-        md_path = write_markdown(combined, EXPORT_DIR, f"combined_summary_{int(time.time())}")
-        pdf_path = try_make_pdf_from_markdown(md_path)
-        print("Exported combined summary:")
-        print("  MD:", md_path)
-        print("  PDF:", pdf_path if pdf_path else "(PDF not created)")
-    elif out_format == 'latex':
-        try_make_pdf_from_latex(per["summary"], EXPORT_DIR, f'{safe_name}_summary_{int(time.time())}')
-    else:
-        print('NO COMBINED SUMMARY GENERATED')
+            lines = ['NOTHING GENERATED']
+    except Exception as e:
+        logger.exception("Export of %s failed", label)
+        lines = [f"Failed to export {label}: {e}"]
+    with _print_lock:
+        print("\n".join(lines))
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python multi_runner.py file1.pdf file2.docx ...")
+    args = sys.argv[1:]
+    stream = "--stream" in args
+    args = [a for a in args if a != "--stream"]
+    if not args:
+        print("Usage: python multi_runner.py [--stream] file1.pdf file2.docx ...")
         sys.exit(1)
-    run(sys.argv[1:])
+    reset_storage()
+    run(args, stream=stream)
     
\ No newline at end of file
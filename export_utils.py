@@ -1,68 +1,223 @@
+import hashlib
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
+import shutil
 import subprocess
 import tempfile
+import threading
+from typing import List, Optional
+
+import metrics
 
 logger = logging.getLogger(__name__)
 
+LATEX_ENGINE = os.getenv("LATEX_ENGINE", "xelatex")
+
+# Compiled PDFs keyed by a hash of the cleaned LaTeX; LATEX_CACHE=0 disables.
+LATEX_CACHE_ENABLED = os.getenv("LATEX_CACHE", "1") != "0"
+LATEX_CACHE_DIR = os.getenv("LATEX_CACHE_DIR", "data/pdf_cache")
+LATEX_CACHE_MAX_MB = float(os.getenv("LATEX_CACHE_MAX_MB", "512"))
+
+# Documents compiled at once (exec's export stage, MarkdownRenderer.render_many).
+LATEX_WORKERS = int(os.getenv("LATEX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
 def write_markdown(md_text: str, out_dir: str, filename_prefix: str) -> str:
     os.makedirs(out_dir, exist_ok=True)
     md_path = Path(out_dir) / f"{filename_prefix}.md"
     md_path.write_text(md_text, encoding="utf-8")
     return str(md_path)
 
+# Stylesheet for Markdown PDFs rendered through WeasyPrint; MARKDOWN_PDF_CSS points to a replacement.
+MARKDOWN_PDF_CSS = os.getenv("MARKDOWN_PDF_CSS")
+_DEFAULT_MARKDOWN_CSS = """
+@page { size: A4; margin: 2cm; }
+body { font-family: serif; font-size: 11pt; line-height: 1.4; }
+h1, h2, h3 { font-family: sans-serif; }
+pre, code { font-family: monospace; font-size: 9pt; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #999; padding: 2px 6px; }
+"""
+
+
+class MarkdownRenderer:
+    """
+    Markdown -> PDF converter that is set up once and reused: the backend (pandoc,
+    else markdown + WeasyPrint) is picked on first use, and the Markdown parser,
+    stylesheet and font configuration are built once instead of per document.
+    """
+
+    def __init__(self, css: Optional[str] = None, workers: int = LATEX_WORKERS):
+        self.css = css
+        self.workers = max(1, workers)
+        self.backend: Optional[str] = None
+        self._lock = threading.Lock()
+        self._md = None
+        self._stylesheets = None
+        self._html_cls = None
+
+    def _setup(self):
+        with self._lock:
+            if self.backend is not None:
+                return
+            try:
+                import pypandoc
+                pypandoc.get_pandoc_path()
+                self._pypandoc = pypandoc
+                self.backend = "pandoc"
+            except Exception as e:
+                logger.info("pypandoc not available: %s", e)
+            if self._setup_weasyprint() and self.backend is None:
+                self.backend = "weasyprint"
+            if self.backend is None:
+                self.backend = "none"
+            logger.info("Markdown PDF backend: %s", self.backend)
+
+    def _setup_weasyprint(self) -> bool:
+        try:
+            import markdown
+            from weasyprint import CSS, HTML
+            from weasyprint.text.fonts import FontConfiguration
+        except Exception as e:
+            logger.info("markdown + weasyprint not available: %s", e)
+            return False
+        css_text = self.css
+        if css_text is None:
+            css_text = Path(MARKDOWN_PDF_CSS).read_text(encoding="utf-8") if MARKDOWN_PDF_CSS else _DEFAULT_MARKDOWN_CSS
+        self._fonts = FontConfiguration()
+        self._stylesheets = [CSS(string=css_text, font_config=self._fonts)]
+        self._md = markdown.Markdown(extensions=["fenced_code", "tables"])
+        self._html_cls = HTML
+        # WeasyPrint rendering isn't shared across threads
+        self._weasy_lock = threading.Lock()
+        return True
+
+    def _render_weasyprint(self, md_text: str, out_pdf: str):
+        with self._weasy_lock:
+            html = self._md.reset().convert(md_text)
+            self._html_cls(string=html).write_pdf(out_pdf, stylesheets=self._stylesheets, font_config=self._fonts)
+
+    def render(self, md_path: str) -> str:
+        """PDF next to md_path; returns its path, or "" when no backend could produce it."""
+        self._setup()
+        with metrics.span("markdown_render", backend=self.backend):
+            return self._render(md_path)
+
+    def _render(self, md_path: str) -> str:
+        out_pdf = str(Path(md_path).with_suffix(".pdf"))
+        if self.backend == "pandoc":
+            try:
+                self._pypandoc.convert_file(md_path, "pdf", outputfile=out_pdf)
+                return out_pdf
+            except Exception as e:
+                logger.info("pypandoc failed: %s", e)
+        if self._stylesheets is not None:
+            try:
+                self._render_weasyprint(Path(md_path).read_text(encoding="utf-8"), out_pdf)
+                return out_pdf
+            except Exception as e:
+                logger.info("weasyprint failed: %s", e)
+        return ""
+
+    def render_many(self, md_paths: List[str]) -> List[str]:
+        """render() over many files, in input order. pandoc runs are spread over `workers` threads."""
+        self._setup()
+        workers = min(self.workers, len(md_paths)) if self.backend == "pandoc" else 1
+        if workers <= 1:
+            return [self.render(p) for p in md_paths]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(self.render, md_paths))
+
+
+_markdown_renderer: Optional[MarkdownRenderer] = None
+
+
+def get_markdown_renderer() -> MarkdownRenderer:
+    global _markdown_renderer
+    if _markdown_renderer is None:
+        _markdown_renderer = MarkdownRenderer()
+    return _markdown_renderer
+
+
 def try_make_pdf_from_markdown(md_path: str) -> str:
-    out_pdf = str(Path(md_path).with_suffix(".pdf"))
-    # Try pypandoc
-    try:
-        import pypandoc
-        logger.info("Converting with pypandoc")
-        pypandoc.convert_file(md_path, "pdf", outputfile=out_pdf)
-        return out_pdf
-    except Exception as e:
-        logger.info("pypandoc not available or failed: %s", e)
-
-    # Fallback: markdown -> html -> weasyprint
-    try:
-        import markdown
-        from weasyprint import HTML
-        logger.info("Converting with markdown + weasyprint")
-        html = markdown.markdown(Path(md_path).read_text(encoding="utf-8"), extensions=["fenced_code", "tables"])
-        HTML(string=html).write_pdf(out_pdf)
-        return out_pdf
-    except Exception as e:
-        logger.info("weasyprint fallback failed: %s", e)
-
-    # If both fail, return empty string
-    return ""
-
-def try_make_pdf_from_latex(lt_text: str, out_dir: str, filename_prefix: str) -> None:
-    # first, clean up latex
-    lt_text = clean_latex(lt_text)
-    # then try and create pdf from latex
+    # If no backend works, returns empty string
+    return get_markdown_renderer().render(md_path)
+
+
+def _latex_cache_path(lt_text: str) -> Path:
+    key = hashlib.sha256(f"{LATEX_ENGINE}\0{lt_text}".encode("utf-8")).hexdigest()
+    return Path(LATEX_CACHE_DIR) / f"{key}.pdf"
+
+
+def _prune_latex_cache():
+    """Drop least recently used PDFs once the cache exceeds LATEX_CACHE_MAX_MB."""
+    entries = []
+    for p in Path(LATEX_CACHE_DIR).glob("*.pdf"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, p))
+    total = sum(size for _, size, _ in entries)
+    limit = LATEX_CACHE_MAX_MB * 1024 * 1024
+    for _, size, p in sorted(entries):
+        if total <= limit:
+            break
+        p.unlink(missing_ok=True)
+        total -= size
+
+
+def _compile_latex(lt_text: str, out_pdf: Path):
     with tempfile.TemporaryDirectory() as tmpdir:
         tex_path = os.path.join(tmpdir, "doc.tex")
 
         with open(tex_path, "w", encoding="utf-8") as f:
             f.write(lt_text)
 
-        result = subprocess.run(
-            ["xelatex", "-interaction=nonstopmode", "-halt-on-error", "doc.tex"],
-            cwd=tmpdir,
-            check=True
-        )
+        cmd = [LATEX_ENGINE, "-interaction=nonstopmode", "-halt-on-error", "doc.tex"]
+
+        # output is captured: several compiles may run at once
+        with metrics.span("pdf_compile", engine=LATEX_ENGINE):
+            result = subprocess.run(cmd, cwd=tmpdir, capture_output=True, text=True, errors="replace")
+            if result.returncode != 0:
+                logger.error("LaTeX compilation failed:\n%s", result.stdout[-2000:])
+                raise RuntimeError("LaTeX compilation failed")
+
+        out_pdf.parent.mkdir(parents=True, exist_ok=True)
+        # temp name + replace, so readers never see a half-written PDF
+        tmp_pdf = out_pdf.with_name(f".{out_pdf.name}.{threading.get_ident()}.tmp")
+        shutil.copyfile(os.path.join(tmpdir, "doc.pdf"), tmp_pdf)
+        os.replace(tmp_pdf, out_pdf)
 
-        # print("STDOUT:\n", result.stdout)
-        # print("STDERR:\n", result.stderr)
 
-        if result.returncode != 0:
-            raise RuntimeError("LaTeX compilation failed")
+def try_make_pdf_from_latex(lt_text: str, out_dir: str, filename_prefix: str) -> str:
+    """
+    Compile lt_text into out_dir/filename_prefix.pdf and return that path. A summary
+    compiled before (same cleaned LaTeX) is copied from the PDF cache instead.
+    """
+    # first, clean up latex
+    lt_text = clean_latex(lt_text)
+    os.makedirs(out_dir, exist_ok=True)
+    final_pdf_path = Path(out_dir) / f"{filename_prefix}.pdf"
+
+    cached = _latex_cache_path(lt_text) if LATEX_CACHE_ENABLED else None
+    if cached is not None and cached.exists():
+        logger.info("PDF cache hit (%s)", cached.stem[:12])
+        metrics.inc("pdf_cache_hits")
+        shutil.copyfile(cached, final_pdf_path)
+        os.utime(cached)
+        return str(final_pdf_path)
+
+    # then try and create pdf from latex
+    if cached is None:
+        _compile_latex(lt_text, final_pdf_path)
+        return str(final_pdf_path)
+    _compile_latex(lt_text, cached)
+    shutil.copyfile(cached, final_pdf_path)
+    _prune_latex_cache()
+    return str(final_pdf_path)
 
-        pdf_path = os.path.join(tmpdir, "doc.pdf")
-        os.makedirs(out_dir, exist_ok=True)
-        final_pdf_path = Path(out_dir) / f"{filename_prefix}.pdf"
-        os.rename(pdf_path, final_pdf_path)
 
 def clean_latex(lt_text: str) -> str:
     lt_text = lt_text.strip()
@@ -0,0 +1,99 @@
+'''
+Local extractive pre-summarization: keeps the highest-ranked sentences of each
+chunk (TF-IDF + TextRank, NumPy only) so fewer tokens reach the LLM.
+'''
+
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+import numpy as np
+
+from resource_intake import ResourceIntake
+import token_budget
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def _terms(sentence: str) -> List[str]:
+    return _WORD.findall(sentence.lower())
+
+
+def _textrank(vectors: np.ndarray, damping: float = 0.85, iterations: int = 30) -> np.ndarray:
+    """PageRank over the cosine-similarity graph of the sentence vectors."""
+    n = vectors.shape[0]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+    sim = unit @ unit.T
+    np.fill_diagonal(sim, 0.0)
+    out_weight = sim.sum(axis=1, keepdims=True)
+    # sentences with no similar neighbour spread their rank uniformly
+    trans = np.divide(sim, out_weight, out=np.full_like(sim, 1.0 / n), where=out_weight > 0)
+    rank = np.full(n, 1.0 / n)
+    for _ in range(iterations):
+        rank = (1 - damping) / n + damping * (trans.T @ rank)
+    return rank
+
+
+def _select(sentences: List[str], idf: Dict[str, float], ratio: float) -> List[str]:
+    """Top-ranked sentences (in original order) within ratio of the chunk's words; at least one."""
+    if len(sentences) <= 1:
+        return sentences
+    term_lists = [_terms(s) for s in sentences]
+    vocab = {t: i for i, t in enumerate(sorted({t for ts in term_lists for t in ts}))}
+    vectors = np.zeros((len(sentences), max(1, len(vocab))))
+    for row, ts in enumerate(term_lists):
+        for t, tf in Counter(ts).items():
+            vectors[row, vocab[t]] = tf * idf.get(t, 0.0)
+    # TextRank decides; total TF-IDF mass breaks ties between equally central sentences
+    scores = _textrank(vectors) + 1e-9 * vectors.sum(axis=1)
+
+    word_counts = [len(s.split()) for s in sentences]
+    budget = max(1, int(math.ceil(ratio * sum(word_counts))))
+    keep, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        if keep and used + word_counts[i] > budget:
+            break
+        keep.append(int(i))
+        used += word_counts[i]
+    return [sentences[i] for i in sorted(keep)]
+
+
+def compress_chunks(chunks: List[Dict[str, Any]], ratio: float = 0.4) -> List[Dict[str, Any]]:
+    """
+    Return copies of chunks whose text keeps only their most central sentences,
+    roughly ratio of the original words. IDF is computed over every sentence of the
+    given chunks, so the document itself defines what is boilerplate. Meta is untouched.
+    """
+    if not 0 < ratio <= 1:
+        raise ValueError("ratio must be in (0, 1]")
+    split = [ResourceIntake._sentence_split(ch["text"]) for ch in chunks]
+    n_sentences = sum(len(s) for s in split)
+    df = Counter(t for sentences in split for s in sentences for t in set(_terms(s)))
+    idf = {t: math.log((1 + n_sentences) / (1 + d)) + 1.0 for t, d in df.items()}
+
+    out = []
+    for ch, sentences in zip(chunks, split):
+        new = dict(ch)
+        if ratio < 1 and sentences:
+            new["text"] = " ".join(_select(sentences, idf, ratio))
+        out.append(new)
+    return out
+
+
+def volume_report(before: List[str], after: List[str]) -> Dict[str, Any]:
+    """Size of the text sent to the LLM before/after compression, in tokens when a tokenizer is configured."""
+    tokenizer = token_budget.get_tokenizer()
+    if tokenizer is not None:
+        unit = "tokens"
+        b = sum(token_budget.count_tokens_batch(before, tokenizer))
+        a = sum(token_budget.count_tokens_batch(after, tokenizer))
+    else:
+        unit = "words"
+        b = sum(len(t.split()) for t in before)
+        a = sum(len(t.split()) for t in after)
+    return {"unit": unit, "before": b, "after": a, "ratio": (a / b) if b else 1.0}
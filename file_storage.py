@@ -1,32 +1,173 @@
 import os
 import sqlite3
 import json
+import logging
+import re
+import threading
 import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# sqlite tuning; WAL + synchronous=NORMAL is durable across app crashes and far faster than the defaults
+DEFAULT_SYNCHRONOUS = os.getenv("STORAGE_SYNCHRONOUS", "NORMAL")
+DEFAULT_CACHE_KB = int(os.getenv("STORAGE_CACHE_KB", "65536"))
+
+
+def _add_column(c, table: str, column: str, decl: str):
+    # ALTER TABLE ADD COLUMN has no IF NOT EXISTS; checking first keeps a migration
+    # re-runnable on a database a crashed or older version left half-migrated
+    c.execute(f"PRAGMA table_info({table})")
+    if column not in [r["name"] for r in c.fetchall()]:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+
+def _migrate_chunks_page_column(c):
+    # databases created before chunks.page existed
+    _add_column(c, "chunks", "page", "INTEGER")
+
+
+def _migrate_lookup_indexes(c):
+    # query_chunks_by_file: WHERE file_id = ? ORDER BY chunk_idx without a scan + sort
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_file_chunk ON chunks(file_id, chunk_idx)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_summaries_file_created ON summaries(file_id, created_at)")
+
+
+def _migrate_chunks_fts(c):
+    # external-content FTS5 index over chunks.text. save_chunks indexes each batch it
+    # writes with one INSERT ... SELECT in the same transaction (per-row insert triggers
+    # cost ~3x in write throughput), so every stored chunk is indexed and deletes and
+    # updates can keep the index in sync through triggers; rebuild indexes existing rows
+    c.execute("CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(text, content='chunks', content_rowid='id')")
+    c.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_ad AFTER DELETE ON chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        END
+        """
+    )
+    c.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_fts_au AFTER UPDATE OF text ON chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            INSERT INTO chunks_fts(rowid, text) VALUES (new.id, new.text);
+        END
+        """
+    )
+    c.execute("INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild')")
+
+
+def _migrate_content_identity(c):
+    # content-addressed files: sha256 of the bytes + when extraction finished;
+    # summaries remember the parameters they were produced with
+    _add_column(c, "files", "content_sha256", "TEXT")
+    _add_column(c, "files", "ingested_at", "REAL")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(content_sha256)")
+    _add_column(c, "summaries", "params", "TEXT")
+
+
+def _migrate_near_duplicates(c):
+    # MinHash signature per chunk, LSH band buckets of canonical chunks, and the
+    # canonical chunk a near-duplicate collapses into (NULL = canonical / unchecked)
+    _add_column(c, "chunks", "minhash", "BLOB")
+    _add_column(c, "chunks", "dup_of", "INTEGER")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunks_dup_of ON chunks(dup_of) WHERE dup_of IS NOT NULL")
+    c.execute("CREATE TABLE IF NOT EXISTS chunk_lsh (band INTEGER, bucket INTEGER, chunk_id INTEGER)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunk_lsh_bucket ON chunk_lsh(band, bucket)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_chunk_lsh_chunk ON chunk_lsh(chunk_id)")
+    # deleting a canonical chunk un-marks its duplicates so the next scan re-checks them
+    c.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS chunks_lsh_ad AFTER DELETE ON chunks BEGIN
+            DELETE FROM chunk_lsh WHERE chunk_id = old.id;
+            UPDATE chunks SET dup_of = NULL, minhash = NULL WHERE dup_of = old.id;
+        END
+        """
+    )
+
+
+# (schema version, migration) pairs; append new ones, never edit applied ones
+MIGRATIONS = [
+    (1, _migrate_chunks_page_column),
+    (2, _migrate_lookup_indexes),
+    (3, _migrate_chunks_fts),
+    (4, _migrate_content_identity),
+    (5, _migrate_near_duplicates),
+]
+
+
+# json.dumps(meta, ensure_ascii=False) without building an encoder per chunk
+_encode_meta = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _enable_wal(conn, timeout: float):
+    # switching a rollback-journal database to WAL needs an exclusive lock, and sqlite
+    # reports BUSY without calling the busy handler when several connections race to
+    # do it on the same file; keep retrying for as long as the busy timeout would
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            return
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) or time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+
 
 class StorageManager:
-    def __init__(self, base_dir: str = "data", reset_db_on_start: bool = True):
+    def __init__(
+        self,
+        base_dir: str = "data",
+        reset_db_on_start: bool = True,
+        synchronous: str = DEFAULT_SYNCHRONOUS,
+        cache_kb: int = DEFAULT_CACHE_KB,
+    ):
         self.base_dir = Path(base_dir)
         self.files_dir = self.base_dir / "files" 
         self.db_path = self.base_dir / "storage.db"
+        self.synchronous = synchronous
+        self.cache_kb = cache_kb
 
         self.base_dir.mkdir(parents=True, exist_ok=True)
         self.files_dir.mkdir(parents=True, exist_ok=True)
 
         if reset_db_on_start and self.db_path.exists():
-            try:
-                self.db_path.unlink()
-            except Exception:
-                pass
+            for p in (self.db_path, Path(f"{self.db_path}-wal"), Path(f"{self.db_path}-shm")):
+                try:
+                    p.unlink()
+                except Exception:
+                    pass
+
+        # one long-lived connection per thread (and per process, in case of fork)
+        self._local = threading.local()
 
         self._ensure_db()
 
     def _conn(self):
-        conn = sqlite3.connect(str(self.db_path))
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
         conn.row_factory = sqlite3.Row
+        _enable_wal(conn, timeout=30)
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_kb)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
         return conn
 
+    def close(self):
+        """Close this thread's connection; the next call reopens it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def _ensure_db(self):
         conn = self._conn()
         c = conn.cursor()
@@ -75,66 +216,156 @@ class StorageManager:
 
         conn.commit()
 
-        c.execute("PRAGMA table_info(chunks)")
-        cols = [r["name"] for r in c.fetchall()]
-        if "page" not in cols:
+        self._migrate(conn)
+
+    def _migrate(self, conn):
+        """
+        Apply every migration newer than the database's PRAGMA user_version, in order.
+        Each runs in its own BEGIN IMMEDIATE transaction (sqlite3 doesn't open one
+        before DDL by itself) and re-reads user_version once it holds the write lock,
+        so processes opening the same database at once apply each step exactly once.
+        """
+        for version, migration in MIGRATIONS:
+            if version <= self.schema_version():
+                continue
+            conn.execute("BEGIN IMMEDIATE")
             try:
-                c.execute("ALTER TABLE chunks ADD COLUMN page INTEGER")
+                if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+                    conn.rollback()
+                    continue
+                migration(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {int(version)}")
                 conn.commit()
-            except Exception:
-                pass
+            except BaseException:
+                conn.rollback()
+                raise
+            logger.info("Applied storage schema migration %d (%s)", version, migration.__name__)
 
-        conn.close()
+    def clear(self):
+        """
+        Delete every stored file, chunk and summary in one transaction, keeping the
+        schema. Unlike reset_db_on_start it is safe while other connections are open.
+        """
+        conn = self._conn()
+        with conn:
+            # the chunks delete trigger empties the full-text index along the way
+            for table in ("chunk_lsh", "chunks", "summaries", "files"):
+                conn.execute(f"DELETE FROM {table}")
+
+    def schema_version(self) -> int:
+        return self._conn().execute("PRAGMA user_version").fetchone()[0]
 
     def save_file_from_bytes(self, file_bytes: bytes, original_name: str, content_type: str = "") -> Dict[str, Any]:
-        size = len(file_bytes)
+        return self.save_file_record(original_name, len(file_bytes), content_type)
+
+    def save_file_record(self, original_name: str, size: int, content_type: str = "", content_sha256: Optional[str] = None) -> Dict[str, Any]:
         conn = self._conn()
         c = conn.cursor()
         c.execute(
-            "INSERT INTO files (original_name, stored_name, content_type, size, uploaded_at) VALUES (?, ?, ?, ?, ?)",
-            (original_name, None, content_type, size, time.time()),
+            "INSERT INTO files (original_name, stored_name, content_type, size, uploaded_at, content_sha256) VALUES (?, ?, ?, ?, ?, ?)",
+            (original_name, None, content_type, size, time.time(), content_sha256),
         )
         file_id = c.lastrowid
         conn.commit()
-        conn.close()
 
         return {"file_id": file_id, "stored_path": None, "original_name": original_name, "size": size}
 
-    def save_chunks(self, file_id: int, chunks: List[Dict[str, Any]]):
+    def save_chunks(self, file_id: int, chunks: Iterable[Dict[str, Any]], batch_size: int = 500) -> int:
+        """
+        Store chunks from any iterable (e.g. a ResourceIntake.iter_* generator).
+        Commits every batch_size rows, indexed for search_chunks in the same
+        transaction, so earlier chunks are queryable while later ones are still
+        being extracted. Returns the number of chunks stored.
+        """
         conn = self._conn()
-        c = conn.cursor()
+        count = 0
+        rows = []
+
+        def _flush():
+            # one executemany + one commit per batch; timed apart from the extraction feeding it
+            with metrics.span("save_chunks"), conn:
+                conn.executemany(
+                    "INSERT INTO chunks (file_id, chunk_idx, text, meta_json, page) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                # the write lock is held, so this batch got consecutive ids ending at last_insert_rowid
+                last = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+                conn.execute("INSERT INTO chunks_fts(rowid, text) SELECT id, text FROM chunks WHERE id > ? AND id <= ?", (last - len(rows), last))
+            rows.clear()
+
         for ch in chunks:
             text = ch["text"]
             meta = ch.get("meta", {}) or {}
-            meta_json = json.dumps(meta, ensure_ascii=False)
+            meta_json = _encode_meta(meta)
             chunk_idx = meta.get("chunk_idx", 0)
             page = meta.get("page")
-            c.execute(
-                "INSERT INTO chunks (file_id, chunk_idx, text, meta_json, page) VALUES (?, ?, ?, ?, ?)",
-                (file_id, chunk_idx, text, meta_json, page),
-            )
+            rows.append((file_id, chunk_idx, text, meta_json, page))
+            count += 1
+            if len(rows) >= batch_size:
+                _flush()
+        if rows:
+            _flush()
+        metrics.inc("chunks_saved", count)
+        return count
+
+    def find_file_by_hash(self, content_sha256: str) -> Optional[Dict[str, Any]]:
+        """Earliest file row with these exact bytes, if any."""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute("SELECT * FROM files WHERE content_sha256 = ? ORDER BY id LIMIT 1", (content_sha256,))
+        row = c.fetchone()
+        c.close()
+        if not row:
+            return None
+        return dict(row)
+
+    def mark_ingested(self, file_id: int):
+        conn = self._conn()
+        conn.execute("UPDATE files SET ingested_at = ? WHERE id = ?", (time.time(), file_id))
+        conn.commit()
+
+    def count_chunks(self, file_id: int) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM chunks WHERE file_id = ?", (file_id,)).fetchone()[0]
+
+    def delete_chunks(self, file_id: int):
+        conn = self._conn()
+        conn.execute("DELETE FROM chunks WHERE file_id = ?", (file_id,))
         conn.commit()
-        conn.close()
 
     def get_file_by_id(self, file_id: int) -> Optional[Dict[str, Any]]:
         conn = self._conn()
         c = conn.cursor()
         c.execute("SELECT * FROM files WHERE id = ?", (file_id,))
         row = c.fetchone()
-        conn.close()
+        c.close()
         if not row:
             return None
         return dict(row)
 
-    def query_chunks_by_file(self, file_id: int) -> List[Dict[str, Any]]:
+    def query_chunks_by_file(self, file_id: int, skip_duplicates_in: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        skip_duplicates_in: leave out near-duplicate chunks whose canonical chunk
+        belongs to one of these files (pass [file_id] to collapse within the file).
+        """
         conn = self._conn()
         c = conn.cursor()
-        c.execute(
-            "SELECT chunk_idx, text, meta_json, page FROM chunks WHERE file_id = ? ORDER BY chunk_idx",
-            (file_id,),
-        )
+        if skip_duplicates_in:
+            placeholders = ",".join("?" for _ in skip_duplicates_in)
+            c.execute(
+                f"""
+                SELECT ch.chunk_idx, ch.text, ch.meta_json, ch.page FROM chunks ch
+                LEFT JOIN chunks canon ON canon.id = ch.dup_of
+                WHERE ch.file_id = ? AND (canon.file_id IS NULL OR canon.file_id NOT IN ({placeholders}))
+                ORDER BY ch.chunk_idx
+                """,
+                (file_id, *skip_duplicates_in),
+            )
+        else:
+            c.execute(
+                "SELECT chunk_idx, text, meta_json, page FROM chunks WHERE file_id = ? ORDER BY chunk_idx",
+                (file_id,),
+            )
         rows = c.fetchall()
-        conn.close()
         result = []
         for r in rows:
             meta = json.loads(r["meta_json"]) if r["meta_json"] else {}
@@ -143,24 +374,141 @@ class StorageManager:
             result.append({"chunk_idx": r["chunk_idx"], "text": r["text"], "meta": meta})
         return result
 
-    def save_summary(self, file_id: int, summary_text: str) -> int:
+    def chunks_missing_minhash(self, file_id: Optional[int] = None) -> List[Tuple[int, int, str]]:
+        """(id, file_id, text) of chunks not yet checked for near-duplicates, oldest first."""
+        conn = self._conn()
+        if file_id is None:
+            rows = conn.execute("SELECT id, file_id, text FROM chunks WHERE minhash IS NULL ORDER BY id").fetchall()
+        else:
+            rows = conn.execute("SELECT id, file_id, text FROM chunks WHERE file_id = ? AND minhash IS NULL ORDER BY id", (file_id,)).fetchall()
+        return [(r["id"], r["file_id"], r["text"]) for r in rows]
+
+    def lsh_lookup(self, keys: List[Tuple[int, int]], batch_size: int = 400) -> Dict[Tuple[int, int], List[int]]:
+        """Canonical chunk ids stored under each (band, bucket) key."""
+        conn = self._conn()
+        out: Dict[Tuple[int, int], List[int]] = {}
+        keys = list(keys)
+        for i in range(0, len(keys), batch_size):
+            part = keys[i:i + batch_size]
+            values = ",".join("(?, ?)" for _ in part)
+            rows = conn.execute(
+                f"WITH k(band, bucket) AS (VALUES {values}) "
+                "SELECT l.band, l.bucket, l.chunk_id FROM chunk_lsh l JOIN k ON l.band = k.band AND l.bucket = k.bucket",
+                [v for key in part for v in key],
+            ).fetchall()
+            for r in rows:
+                out.setdefault((r["band"], r["bucket"]), []).append(r["chunk_id"])
+        return out
+
+    def get_chunk_minhashes(self, chunk_ids: List[int], batch_size: int = 500) -> Dict[int, Tuple[int, bytes]]:
+        """chunk id -> (file_id, minhash blob)."""
+        conn = self._conn()
+        out = {}
+        for i in range(0, len(chunk_ids), batch_size):
+            part = chunk_ids[i:i + batch_size]
+            rows = conn.execute(
+                f"SELECT id, file_id, minhash FROM chunks WHERE id IN ({','.join('?' for _ in part)})",
+                part,
+            ).fetchall()
+            for r in rows:
+                out[r["id"]] = (r["file_id"], r["minhash"])
+        return out
+
+    def save_near_duplicates(
+        self,
+        minhashes: List[Tuple[bytes, int]],
+        lsh_rows: List[Tuple[int, int, int]],
+        dup_marks: List[Tuple[int, int]],
+        drop_ids: List[int],
+    ):
+        """
+        One transaction: (minhash, chunk_id) signatures, (band, bucket, chunk_id)
+        LSH rows of new canonical chunks, (dup_of, chunk_id) marks, and chunks to delete.
+        """
+        conn = self._conn()
+        with conn:
+            conn.executemany("UPDATE chunks SET minhash = ? WHERE id = ?", minhashes)
+            conn.executemany("INSERT INTO chunk_lsh (band, bucket, chunk_id) VALUES (?, ?, ?)", lsh_rows)
+            conn.executemany("UPDATE chunks SET dup_of = ? WHERE id = ?", dup_marks)
+            conn.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in drop_ids])
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        # quote each word so user text can't trip FTS5 syntax; any term may match, bm25 ranks
+        terms = re.findall(r"\w+", query)
+        return " OR ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+    def search_chunks(self, query: str, file_ids: Optional[List[int]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Ranked full-text search over stored chunks (best match first).
+        Each hit carries file_id, chunk_idx, text, a highlighted snippet, the
+        bm25 score (lower is better) and the chunk's provenance meta.
+        """
+        match = self._fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT c.file_id, c.chunk_idx, c.text, c.meta_json, c.page, "
+            "bm25(chunks_fts) AS score, snippet(chunks_fts, 0, '[', ']', '...', 16) AS snippet "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if file_ids:
+            sql += f" AND c.file_id IN ({','.join('?' * len(file_ids))})"
+            params.extend(file_ids)
+        sql += " ORDER BY score LIMIT ?"
+        params.append(limit)
+
+        c = self._conn().cursor()
+        c.execute(sql, params)
+        rows = c.fetchall()
+        result = []
+        for r in rows:
+            meta = json.loads(r["meta_json"]) if r["meta_json"] else {}
+            if r["page"] is not None:
+                meta["page"] = r["page"]
+            result.append({
+                "file_id": r["file_id"],
+                "chunk_idx": r["chunk_idx"],
+                "text": r["text"],
+                "snippet": r["snippet"],
+                "score": r["score"],
+                "meta": meta,
+            })
+        return result
+
+    def save_summary(self, file_id: int, summary_text: str, params: Optional[str] = None) -> int:
         conn = self._conn()
         c = conn.cursor()
         c.execute(
-            "INSERT INTO summaries (file_id, summary_text, created_at) VALUES (?, ?, ?)",
-            (file_id, summary_text, time.time()),
+            "INSERT INTO summaries (file_id, summary_text, created_at, params) VALUES (?, ?, ?, ?)",
+            (file_id, summary_text, time.time(), params),
         )
         summary_id = c.lastrowid
         conn.commit()
-        conn.close()
         return summary_id
 
+    def get_latest_summary(self, file_id: int, params: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Most recent summary of file_id produced with exactly these params."""
+        conn = self._conn()
+        c = conn.cursor()
+        c.execute(
+            "SELECT * FROM summaries WHERE file_id = ? AND params IS ? ORDER BY created_at DESC LIMIT 1",
+            (file_id, params),
+        )
+        row = c.fetchone()
+        c.close()
+        if not row:
+            return None
+        return dict(row)
+
     def get_summary_by_id(self, summary_id: int) -> Optional[Dict[str, Any]]:
         conn = self._conn()
         c = conn.cursor()
         c.execute("SELECT * FROM summaries WHERE id = ?", (summary_id,))
         row = c.fetchone()
-        conn.close()
+        c.close()
         if not row:
             return None
         return dict(row)
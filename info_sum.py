@@ -2,11 +2,28 @@
 Function that takes in text and returns summarized notes, with bulletpoints and appropriate title and sections
 '''
 
-from huggingface_hub import InferenceClient
+from huggingface_hub import InferenceClient, AsyncInferenceClient
 from huggingface_hub import login
+from huggingface_hub import set_client_factory, set_async_client_factory, close_session
 from dotenv import load_dotenv
+import asyncio
+import httpx
 import os
 import logging
+import threading
+import weakref
+from typing import Iterator, Optional, Union
+
+from llm_cache import LLMCache, make_cache_key
+import metrics
+from rate_limit import RateLimiter
+from summarizer_backends import DEFAULT_BACKEND, SummarizerBackend, create_backend
+
+try:
+    # private module; without it the pool keeps huggingface_hub's default clients
+    from huggingface_hub.utils._http import default_client_factory, default_async_client_factory
+except ImportError:
+    default_client_factory = default_async_client_factory = None
 
 load_dotenv()
 
@@ -15,7 +32,7 @@ logger.setLevel(logging.INFO)
 
 HF_TOKEN = os.getenv("HF_TOKEN")
 
-if not HF_TOKEN:
+if not HF_TOKEN and DEFAULT_BACKEND == "hf":
     logger.warning("HF_TOKEN not set - summarization will fail until you set HF_TOKEN in env or .env")
 
 DEFAULT_MODEL = os.getenv(
@@ -25,85 +42,416 @@ DEFAULT_MODEL = os.getenv(
 
 DEFAULT_PROVIDER = os.getenv("HF_PROVIDER", None)
 
+# Optional endpoint override (e.g. a local OpenAI-compatible server or mock).
+DEFAULT_BASE_URL = os.getenv("HF_BASE_URL", None)
+
+# Max pooled keep-alive connections shared by all summarize_text callers.
+CLIENT_POOL_SIZE = int(os.getenv("HF_CLIENT_POOL_SIZE", "8"))
+CLIENT_TIMEOUT = float(os.getenv("HF_CLIENT_TIMEOUT", "120"))
+
+# Persistent response cache; set SUMMARIZER_CACHE=0 to disable.
+CACHE_ENABLED = os.getenv("SUMMARIZER_CACHE", "1") != "0"
+CACHE_DIR = os.getenv("SUMMARIZER_CACHE_DIR", "data")
+CACHE_MAX_MB = float(os.getenv("SUMMARIZER_CACHE_MAX_MB", "256"))
+CACHE_MAX_AGE_DAYS = float(os.getenv("SUMMARIZER_CACHE_MAX_AGE_DAYS", "30"))
+
+# Client-side throttling and retry (0 = no requests/min or tokens/min limit).
+MAX_RPM = float(os.getenv("SUMMARIZER_MAX_RPM", "0"))
+MAX_TPM = float(os.getenv("SUMMARIZER_MAX_TPM", "0"))
+MAX_CONCURRENCY = int(os.getenv("SUMMARIZER_MAX_CONCURRENCY", str(CLIENT_POOL_SIZE)))
+MAX_RETRIES = int(os.getenv("SUMMARIZER_MAX_RETRIES", "5"))
+BACKOFF_BASE_S = float(os.getenv("SUMMARIZER_BACKOFF_BASE_S", "1"))
+BACKOFF_MAX_S = float(os.getenv("SUMMARIZER_BACKOFF_MAX_S", "60"))
+
+_cache = None
+_limiter = None
+_backend = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None and CACHE_ENABLED:
+        _cache = LLMCache(
+            base_dir=CACHE_DIR,
+            max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+            max_age_s=CACHE_MAX_AGE_DAYS * 24 * 3600,
+        )
+    return _cache
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide limiter shared by summarize_text and summarize_text_async."""
+    global _limiter
+    if _limiter is None:
+        with _client_lock:
+            if _limiter is None:
+                _limiter = RateLimiter(
+                    max_rpm=MAX_RPM,
+                    max_tpm=MAX_TPM,
+                    max_concurrency=MAX_CONCURRENCY,
+                    max_retries=MAX_RETRIES,
+                    backoff_base_s=BACKOFF_BASE_S,
+                    backoff_max_s=BACKOFF_MAX_S,
+                )
+    return _limiter
+
+
+def get_backend() -> Optional[SummarizerBackend]:
+    """The SUMMARIZER_BACKEND engine, or None for the built-in Hugging Face client."""
+    global _backend
+    if DEFAULT_BACKEND == "hf":
+        return None
+    if _backend is None:
+        with _client_lock:
+            if _backend is None:
+                _backend = create_backend(DEFAULT_BACKEND)
+    return _backend
+
+
+def model_identity():
+    """(model, provider) that answer requests, so each backend gets its own cache entries."""
+    backend = get_backend()
+    if backend is None:
+        return DEFAULT_MODEL, DEFAULT_PROVIDER
+    return backend.model, backend.provider
+
+
+def _estimate_tokens(messages, max_tokens: int) -> int:
+    # ~4 characters per token; corrected from the response's usage once it arrives
+    return sum(len(m["content"]) for m in messages) // 4 + max_tokens
+
+
+def _usage_tokens(completion) -> Optional[int]:
+    usage = getattr(completion, "usage", None)
+    if usage is None:
+        return None
+    metrics.inc("llm_prompt_tokens", getattr(usage, "prompt_tokens", None) or 0)
+    metrics.inc("llm_completion_tokens", getattr(usage, "completion_tokens", None) or 0)
+    return getattr(usage, "total_tokens", None)
+
+
+def _pool_limits(size: int) -> httpx.Limits:
+    return httpx.Limits(max_connections=size, max_keepalive_connections=size)
+
+
+def _pooled_factory(default_factory, client_cls, limits: httpx.Limits, timeout: httpx.Timeout):
+    """
+    huggingface_hub's default client factory with our pool limits and timeout. The hub's
+    event hooks (HF_HUB_OFFLINE, request ids, error handling) are taken from the client
+    its own factory builds, so they follow the installed version.
+    """
+    def factory():
+        hooks = default_factory().event_hooks
+        return client_cls(limits=limits, timeout=timeout, follow_redirects=True, event_hooks=hooks)
+    return factory
+
+
+def configure_client_pool(size: int = CLIENT_POOL_SIZE, timeout: float = CLIENT_TIMEOUT):
+    """
+    Size the process-wide connection pool used by InferenceClient/AsyncInferenceClient.
+    huggingface_hub shares one httpx.Client between sync clients; this swaps it
+    for one with our limits and drops any cached clients. Done on the first
+    get_client()/get_async_client() unless called before.
+    """
+    global _client, _pool_configured
+    _pool_configured = True
+    if default_client_factory is None:
+        logger.warning("huggingface_hub has no default client factories; using its default connection pool")
+        return
+    limits = _pool_limits(size)
+    http_timeout = httpx.Timeout(timeout, connect=min(timeout, 10.0))
+    set_client_factory(_pooled_factory(default_client_factory, httpx.Client, limits, http_timeout))
+    set_async_client_factory(_pooled_factory(default_async_client_factory, httpx.AsyncClient, limits, http_timeout))
+    with _client_lock:
+        _client = None
+        _async_clients.clear()
 
-def _make_client():
 
+def _ensure_client_pool():
+    if not _pool_configured:
+        with _pool_lock:
+            if not _pool_configured:
+                configure_client_pool()
+
+
+def _client_kwargs():
     if not HF_TOKEN:
         raise RuntimeError(
             "HF_TOKEN not set. Please set HF_TOKEN in your environment or .env"
         )
 
+    if DEFAULT_BASE_URL:
+        return {"base_url": DEFAULT_BASE_URL, "api_key": HF_TOKEN}
+
     if DEFAULT_PROVIDER:
-        return InferenceClient(
-            provider=DEFAULT_PROVIDER,
-            api_key=HF_TOKEN
-        )
+        return {"provider": DEFAULT_PROVIDER, "api_key": HF_TOKEN}
 
-    return InferenceClient(
-        api_key=HF_TOKEN
-    )
+    return {"api_key": HF_TOKEN}
 
-def summarize_text(
-    text: str,
-    *,
-    output_format: str = "markdown",
-    max_tokens: int = 2000,
-    temperature: float = 0.2
-) -> str:
 
-    client = _make_client()
-    output_format = output_format.lower()
+def _make_client():
+    return InferenceClient(**_client_kwargs())
+
+
+_client_lock = threading.Lock()
+_client = None
+_pool_lock = threading.Lock()
+_pool_configured = False
+# AsyncInferenceClient sessions are bound to the loop they were opened on.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncInferenceClient]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> InferenceClient:
+    """Shared InferenceClient; safe to use from several threads at once."""
+    global _client
+    _ensure_client_pool()
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _make_client()
+    return _client
 
-    if output_format not in ("markdown", "latex"):
-        raise ValueError("output_format must be markdown or latex")
 
+def get_async_client() -> AsyncInferenceClient:
+    """AsyncInferenceClient reused for every call made on the running event loop."""
+    loop = asyncio.get_running_loop()
+    _ensure_client_pool()
+    with _client_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = AsyncInferenceClient(**_client_kwargs())
+            _async_clients[loop] = client
+    return client
+
+
+def close_clients():
+    global _client
+    with _client_lock:
+        _client = None
+        _async_clients.clear()
+    close_session()
+
+
+def build_system_prompt(output_format: str) -> str:
     if output_format == "markdown":
-        system_prompt = (
+        return (
             "You are an expert academic assistant producing concise Markdown notes.\n"
             "- Use headings\n"
             "- Use bullet points\n"
             "- Include citations from provenance\n"
             "- Output only Markdown"
         )
-    else:
-        system_prompt = (
-            "You are an expert academic assistant producing concise LaTeX notes.\n"
-            "- Use sections\n"
-            "- Use itemize\n"
-            "- Include provenance comments\n"
-            "- Output only LaTeX code\n"
-            "- Do not include Mardown code, or code of any other format\n"
-            "- Use vocabulary that matches the level of the provided chuncks\n"
-        )
+    return (
+        "You are an expert academic assistant producing concise LaTeX notes.\n"
+        "- Use sections\n"
+        "- Use itemize\n"
+        "- Include provenance comments\n"
+        "- Output only LaTeX code\n"
+        "- Do not include Mardown code, or code of any other format\n"
+        "- Use vocabulary that matches the level of the provided chuncks\n"
+    )
+
+
+def request_key(text: str, *, output_format: str = "markdown", max_tokens: int = 2000, temperature: float = 0.2) -> str:
+    """Content hash of a summarize_text request: same key, same prompt to the same model."""
+    output_format = output_format.lower()
+    model, provider = model_identity()
+    return make_cache_key(
+        model=model,
+        provider=provider,
+        output_format=output_format,
+        system_prompt=build_system_prompt(output_format),
+        text=text,
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+
+def _prepare(text: str, output_format: str, max_tokens: int, temperature: float, use_cache: bool):
+    """Validate input and build (messages, cache, cache_key, cached_response)."""
+    output_format = output_format.lower()
+
+    if output_format not in ("markdown", "latex"):
+        raise ValueError("output_format must be markdown or latex")
+
+    system_prompt = build_system_prompt(output_format)
+
+    cache = get_cache() if use_cache else None
+    cache_key = None
+    cached = None
+    if cache is not None:
+        cache_key = request_key(text, output_format=output_format, max_tokens=max_tokens, temperature=temperature)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logger.info("LLM cache hit (%s)", cache_key[:12])
+            metrics.inc("llm_cache_hits")
 
     user_prompt = (
         "Summarize the following chunks:\n\n"
         + text
     )
 
+    messages = [
+        {
+            "role": "system",
+            "content": system_prompt
+        },
+        {
+            "role": "user",
+            "content": user_prompt
+        },
+    ]
+    return messages, cache, cache_key, cached
+
+
+def _finish(completion, cache, cache_key) -> str:
+    out = completion.choices[0].message.content
+
+    if isinstance(out, bytes):
+        out = out.decode("utf-8", errors="replace")
+
+    out = str(out)
+    if cache is not None:
+        cache.put(cache_key, out)
+    return out
+
+
+def summarize_text(
+    text: str,
+    *,
+    output_format: str = "markdown",
+    max_tokens: int = 2000,
+    temperature: float = 0.2,
+    use_cache: bool = True,
+    stream: bool = False
+) -> Union[str, Iterator[str]]:
+    """stream=True returns an iterator over the text pieces as the model produces them."""
+
+    messages, cache, cache_key, cached = _prepare(text, output_format, max_tokens, temperature, use_cache)
+    if stream:
+        return _stream_completion(messages, cache, cache_key, cached, max_tokens, temperature)
+    if cached is not None:
+        return cached
+
+    backend = get_backend()
+    if backend is not None:
+        try:
+            with metrics.span("llm_call", backend=backend.name):
+                out = backend.complete(messages, max_tokens=max_tokens, temperature=temperature)
+        except Exception as e:
+            logger.exception("LLM call failed: %s", e)
+            raise
+        if cache is not None:
+            cache.put(cache_key, out)
+        return out
+
+    client = get_client()
+    limiter = get_rate_limiter()
+
     try:
-        completion = client.chat.completions.create(
+        # includes rate-limiter waits and retries
+        with metrics.span("llm_call", backend="hf"):
+            completion = limiter.call(
+                lambda: client.chat.completions.create(
+                    model=DEFAULT_MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                ),
+                tokens=_estimate_tokens(messages, max_tokens),
+                usage=_usage_tokens,
+            )
+        return _finish(completion, cache, cache_key)
+
+    except Exception as e:
+        logger.exception("LLM call failed: %s", e)
+        raise
+
+
+def _stream_completion(messages, cache, cache_key, cached, max_tokens: int, temperature: float) -> Iterator[str]:
+    if cached is not None:
+        yield cached
+        return
+
+    backend = get_backend()
+    parts = []
+    try:
+        # the span lasts until the stream is drained
+        with metrics.span("llm_call", backend=backend.name if backend is not None else "hf", stream="1"):
+            if backend is not None:
+                for delta in backend.stream(messages, max_tokens=max_tokens, temperature=temperature):
+                    parts.append(delta)
+                    yield delta
+            else:
+                yield from _stream_hf(messages, max_tokens, temperature, parts)
+    except Exception as e:
+        logger.exception("LLM call failed: %s", e)
+        raise
+
+    # only complete responses are cached
+    if cache is not None:
+        cache.put(cache_key, "".join(parts))
+
+
+def _stream_hf(messages, max_tokens: int, temperature: float, parts) -> Iterator[str]:
+    client = get_client()
+    chunks = get_rate_limiter().stream(
+        lambda: client.chat.completions.create(
             model=DEFAULT_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": system_prompt
-                },
-                {
-                    "role": "user",
-                    "content": user_prompt
-                },
-            ],
+            messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
-        )
+            stream=True,
+        ),
+        tokens=_estimate_tokens(messages, max_tokens),
+    )
+    for chunk in chunks:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+
+async def summarize_text_async(
+    text: str,
+    *,
+    output_format: str = "markdown",
+    max_tokens: int = 2000,
+    temperature: float = 0.2,
+    use_cache: bool = True
+) -> str:
+    """asyncio counterpart of summarize_text using the pooled AsyncInferenceClient."""
+    messages, cache, cache_key, cached = _prepare(text, output_format, max_tokens, temperature, use_cache)
+    if cached is not None:
+        return cached
 
-        out = completion.choices[0].message.content
+    backend = get_backend()
+    if backend is not None:
+        # in-process backends block; run them off the event loop
+        with metrics.span("llm_call", backend=backend.name):
+            out = await asyncio.to_thread(backend.complete, messages, max_tokens=max_tokens, temperature=temperature)
+        if cache is not None:
+            cache.put(cache_key, out)
+        return out
 
-        if isinstance(out, bytes):
-            out = out.decode("utf-8", errors="replace")
+    client = get_async_client()
+    limiter = get_rate_limiter()
 
-        return str(out)
+    try:
+        with metrics.span("llm_call", backend="hf"):
+            completion = await limiter.call_async(
+                lambda: client.chat.completions.create(
+                    model=DEFAULT_MODEL,
+                    messages=messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                ),
+                tokens=_estimate_tokens(messages, max_tokens),
+                usage=_usage_tokens,
+            )
+        return _finish(completion, cache, cache_key)
 
     except Exception as e:
         logger.exception("LLM call failed: %s", e)
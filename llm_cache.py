@@ -0,0 +1,224 @@
+'''
+Disk-backed, content-addressed cache for LLM completions.
+Lives in a sidecar sqlite file next to storage.db so it survives storage resets.
+'''
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def make_cache_key(
+    *,
+    model: str,
+    provider: Optional[str],
+    output_format: str,
+    system_prompt: str,
+    text: str,
+    temperature: float,
+    max_tokens: int,
+) -> str:
+    payload = json.dumps(
+        [model, provider, output_format, system_prompt, text, temperature, max_tokens],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Entries expire after max_age_s and the least recently used ones are dropped once
+    the responses exceed max_bytes. The total size is tracked as entries come and go,
+    so a put doesn't re-sum the table; expired entries are swept every sweep_every puts.
+    """
+
+    def __init__(
+        self,
+        base_dir: str = "data",
+        db_name: str = "llm_cache.db",
+        max_bytes: int = 256 * 1024 * 1024,
+        max_age_s: Optional[float] = 30 * 24 * 3600,
+        sweep_every: int = 256,
+    ):
+        self.base_dir = Path(base_dir)
+        self.db_path = self.base_dir / db_name
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.sweep_every = max(1, sweep_every)
+
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        # one WAL connection per thread (and per process, in case of fork), as in StorageManager
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._puts = 0
+
+        self._ensure_db()
+        self._total_bytes = self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def close(self):
+        """Close this thread's connection; the next call reopens it."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _ensure_db(self):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    last_access REAL,
+                    hit_count INTEGER DEFAULT 0
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+
+    def _removed(self, n: int, size: int):
+        with self._lock:
+            self.evictions += n
+            self._total_bytes -= size
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute("SELECT response, size, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row and self.max_age_s is not None and now - row["created_at"] > self.max_age_s:
+            with conn:
+                deleted = conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,)).rowcount
+            if deleted:
+                self._removed(1, row["size"])
+            row = None
+        if row:
+            with conn:
+                conn.execute(
+                    "UPDATE llm_cache SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    (now, key),
+                )
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row["response"] if row else None
+
+    def get_many(self, keys: List[str], batch_size: int = 500) -> Dict[str, str]:
+        """
+        Unexpired responses for whichever of keys are cached, in one pass; counts
+        only the hits, as the misses are looked up again when they are requested.
+        """
+        now = time.time()
+        out: Dict[str, str] = {}
+        conn = self._conn()
+        for i in range(0, len(keys), batch_size):
+            part = keys[i:i + batch_size]
+            rows = conn.execute(
+                f"SELECT key, response, created_at FROM llm_cache WHERE key IN ({','.join('?' for _ in part)})",
+                part,
+            ).fetchall()
+            out.update((r["key"], r["response"]) for r in rows if self.max_age_s is None or now - r["created_at"] <= self.max_age_s)
+        if out:
+            with conn:
+                conn.executemany(
+                    "UPDATE llm_cache SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+                    [(now, k) for k in out],
+                )
+        with self._lock:
+            self.hits += len(out)
+        return out
+
+    def put(self, key: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        conn = self._conn()
+        with conn:
+            old = conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, last_access, hit_count) VALUES (?, ?, ?, ?, ?, 0)",
+                (key, response, size, now, now),
+            )
+        with self._lock:
+            self._total_bytes += size - (old["size"] if old else 0)
+            self._puts += 1
+            over = self.max_bytes is not None and self._total_bytes > self.max_bytes
+            sweep = self._puts % self.sweep_every == 0
+        if over or sweep:
+            self.evict()
+
+    def evict(self) -> int:
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        removed = 0
+        freed = 0
+        conn = self._conn()
+        with conn:
+            if self.max_age_s is not None:
+                cutoff = time.time() - self.max_age_s
+                row = conn.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS total FROM llm_cache WHERE created_at < ?", (cutoff,)).fetchone()
+                if row["n"]:
+                    conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (cutoff,))
+                    removed += row["n"]
+                    freed += row["total"]
+            with self._lock:
+                total = self._total_bytes - freed
+            if self.max_bytes is not None and total > self.max_bytes:
+                doomed = []
+                for r in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC"):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((r["key"],))
+                    total -= r["size"]
+                    freed += r["size"]
+                conn.executemany("DELETE FROM llm_cache WHERE key = ?", doomed)
+                removed += len(doomed)
+        if removed:
+            self._removed(removed, freed)
+            logger.info("LLM cache evicted %d entries", removed)
+        return removed
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM llm_cache")
+        with self._lock:
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        row = self._conn().execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS total FROM llm_cache").fetchone()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": row["n"],
+                "bytes": row["total"],
+            }
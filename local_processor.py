@@ -1,13 +1,21 @@
 import sys
 import json
 from pathlib import Path
-from typing import List, Union
-from processing import process_file_bytes, get_file_chunks
+from typing import Dict, List, Optional, Union
+from processing import process_file_path, process_file_paths, get_file_chunks, reset_storage
+import metrics
 
-def process_files(paths: Union[str, List[str]]) -> List[int]:
+def _print_progress(done, total, path, result):
+    status = result.get("error") or f"{result.get('chunks_extracted', 0)} chunks" + (" (unchanged)" if result.get("reused") else "")
+    print(f"[{done}/{total}] {Path(path).name}: {status}", flush=True)
+
+
+def process_files(paths: Union[str, List[str]], workers: int = 1, errors: Optional[Dict[str, str]] = None, progress: bool = False) -> List[int]:
     """
     Process a directory path or list of file paths.
-    Returns list of file_ids created in DB.
+    Returns list of file_ids created in DB, in file order.
+    workers > 1 extracts that many files at once in separate processes.
+    errors, if given, collects {path: error message} for files that failed.
     """
     file_ids = []
     if isinstance(paths, str):
@@ -21,29 +29,40 @@ def process_files(paths: Union[str, List[str]]) -> List[int]:
     else:
         files = [Path(x) for x in paths]
 
-    for f in files:
-        b = f.read_bytes()
-        summary = process_file_bytes(b, f.name, content_type="")
-        if "file_id" in summary:
-            file_ids.append(summary["file_id"])
-        else:
+    results = process_file_paths([str(f) for f in files], workers=workers, on_progress=_print_progress if progress else None)
+    for f, summary in zip(files, results):
+        if "error" in summary:
             print("Processing failed for", f, summary.get("error"))
+            if errors is not None:
+                errors[str(f)] = summary["error"]
+        else:
+            file_ids.append(summary["file_id"])
     return file_ids
 
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python local_processor.py /path/to/file.pdf OR python local_processor.py /path/to/directory")
+    args = sys.argv[1:]
+    workers = 1
+    if "--workers" in args:
+        i = args.index("--workers")
+        try:
+            workers = int(args[i + 1])
+        except (IndexError, ValueError):
+            print("--workers needs a number")
+            return
+        del args[i:i + 2]
+    if not args:
+        print("Usage: python local_processor.py [--workers N] /path/to/file.pdf OR python local_processor.py [--workers N] /path/to/directory")
         return
-    p = Path(sys.argv[1])
+    p = Path(args[0])
     if not p.exists():
         print("File/dir not found:", p)
         return
+    reset_storage()
 
     # single-file behavior for backwards compatibility
     if p.is_file():
-        b = p.read_bytes()
-        summary = process_file_bytes(b, p.name, content_type="")
+        summary = process_file_path(str(p), p.name, content_type="")
         print("Summary:")
         print(json.dumps(summary, indent=2))
         if "file_id" in summary:
@@ -57,8 +76,15 @@ def main():
             print("Processing returned error:", summary.get("error"))
     else:
         # directory mode
-        file_ids = process_files(str(p))
+        errors: Dict[str, str] = {}
+        file_ids = process_files(str(p), workers=workers, errors=errors, progress=True)
         print("Processed files, file_ids:", file_ids)
+        if errors:
+            print(f"{len(errors)} file(s) failed:")
+            for path, err in errors.items():
+                print(f"  {path}: {err}")
+    if metrics.ENABLED:
+        print("Metrics written to", " and ".join(metrics.write_files()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,176 @@
+'''
+Process-wide timing spans and counters for the pipeline, exportable as JSON or
+Prometheus text. Off unless PIPELINE_METRICS=1: span() then hands back a shared
+no-op context manager and inc()/observe() return at once, so instrumented code
+costs a function call. Work done in process-pool workers is not collected.
+'''
+
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+ENABLED = os.getenv("PIPELINE_METRICS", "0") == "1"
+
+# where exec.run writes <base>.json and <base>.prom at the end of a run
+METRICS_FILE = os.getenv("PIPELINE_METRICS_FILE", "data/metrics")
+
+# histogram bucket upper bounds, seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Labels], float] = {}
+# (name, labels) -> [count, sum, max, per-bucket counts]
+_histograms: Dict[Tuple[str, Labels], list] = {}
+
+
+def enable(on: bool = True):
+    global ENABLED
+    ENABLED = on
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels):
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels):
+    if not ENABLED:
+        return
+    key = (name, _labels(labels))
+    with _lock:
+        h = _histograms.get(key)
+        if h is None:
+            h = _histograms[key] = [0, 0.0, 0.0, [0] * len(BUCKETS)]
+        h[0] += 1
+        h[1] += seconds
+        h[2] = max(h[2], seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[3][i] += 1
+                break
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class _Span:
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        observe(self.name, time.perf_counter() - self.t0, **self.labels)
+        if exc_type is not None:
+            inc(f"{self.name}_errors", **self.labels)
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """`with span("pdf_compile"):` records the block's duration (and failures) under name."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name, labels)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot() -> Dict[str, Any]:
+    """{"counters": [...], "spans": [...]}, one entry per name and label set."""
+    with _lock:
+        counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(_counters.items())]
+        spans = [
+            {
+                "name": n, "labels": dict(l), "count": h[0], "sum_s": round(h[1], 6),
+                "mean_s": round(h[1] / h[0], 6) if h[0] else 0.0, "max_s": round(h[2], 6),
+                "buckets": {str(b): c for b, c in zip(BUCKETS, h[3])},
+            }
+            for (n, l), h in sorted(_histograms.items())
+        ]
+    return {"counters": counters, "spans": spans}
+
+
+def to_json() -> str:
+    return json.dumps(snapshot(), indent=2)
+
+
+def _metric_name(name: str) -> str:
+    return "pipeline_" + re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _prom_labels(labels: Dict[str, str], **extra) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+
+def to_prometheus() -> str:
+    """Prometheus text exposition format: counters as *_total, spans as *_seconds histograms."""
+    snap = snapshot()
+    lines = []
+    seen = set()
+    for c in snap["counters"]:
+        name = _metric_name(c["name"]) + "_total"
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_prom_labels(c['labels'])} {c['value']:g}")
+    for s in snap["spans"]:
+        name = _metric_name(s["name"]) + "_seconds"
+        if name not in seen:
+            seen.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, count in s["buckets"].items():
+            cumulative += count
+            lines.append(f"{name}_bucket{_prom_labels(s['labels'], le=bound)} {cumulative}")
+        lines.append(f"{name}_bucket{_prom_labels(s['labels'], le='+Inf')} {s['count']}")
+        lines.append(f"{name}_sum{_prom_labels(s['labels'])} {s['sum_s']:g}")
+        lines.append(f"{name}_count{_prom_labels(s['labels'])} {s['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write_files(base: str = METRICS_FILE) -> Tuple[str, str]:
+    """Write <base>.json and <base>.prom; returns both paths."""
+    Path(base).parent.mkdir(parents=True, exist_ok=True)
+    json_path, prom_path = f"{base}.json", f"{base}.prom"
+    Path(json_path).write_text(to_json(), encoding="utf-8")
+    Path(prom_path).write_text(to_prometheus(), encoding="utf-8")
+    return json_path, prom_path
@@ -0,0 +1,147 @@
+'''
+Near-duplicate chunk detection with MinHash signatures and LSH banding.
+Repeated slide headers/footers, handouts that restate the lecture, the same bullet
+text on many slides: each such chunk is marked as a duplicate of the first
+(canonical) copy, within a file and across every file already in storage.
+'''
+
+import logging
+import os
+import re
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# estimated Jaccard similarity (word 3-gram shingles) at or above which a chunk is a duplicate
+DEFAULT_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+
+# mark: keep duplicates but flag them; drop: delete duplicates of chunks in the same file; off
+DEFAULT_MODE = os.getenv("NEAR_DUP_MODE", "mark")
+
+# The signature layout is persisted in chunks.minhash / chunk_lsh: changing any of
+# these (or the seed) needs those columns cleared. 32 bands x 4 rows catch pairs
+# above ~0.6 similarity almost surely; the threshold itself is applied afterwards
+# on the full signatures, so it can be tuned without re-indexing.
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_WORDS = 3
+
+_rng = np.random.RandomState(20240501)
+
+
+def _odd_u64(size):
+    return (_rng.randint(1, 1 << 62, size=size, dtype=np.int64).astype(np.uint64) << np.uint64(1)) | np.uint64(1)
+
+
+# multiply-shift hash family: h(x) = high 32 bits of (a*x + b) mod 2^64, a odd
+_A = _odd_u64((NUM_PERM, 1))
+_B = _odd_u64((NUM_PERM, 1))
+_GRAM_MIX = np.uint64(1099511628211)
+_ROW_MIX = _odd_u64(ROWS)
+
+_WORD = re.compile(r"\w+")
+
+
+def _shingle_hashes(text: str) -> Optional[np.ndarray]:
+    """Distinct 64-bit hashes of the word SHINGLE_WORDS-grams of text, lower-cased."""
+    words = _WORD.findall(text.lower())
+    if not words:
+        return None
+    h = np.array(list(map(zlib.crc32, map(str.encode, words))), dtype=np.uint64)
+    # roll the word hashes into n-gram hashes without building the n-gram strings;
+    # texts shorter than an n-gram become a single shingle
+    k = min(SHINGLE_WORDS, len(words))
+    n = len(words) - k + 1
+    grams = h[:n].copy()
+    with np.errstate(over="ignore"):
+        for j in range(1, k):
+            grams = grams * _GRAM_MIX + h[j:j + n]
+    return np.unique(grams)
+
+
+def signature(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM-long MinHash signature (uint32), or None for text without words."""
+    hashes = _shingle_hashes(text)
+    if hashes is None:
+        return None
+    # every permutation x every shingle in one broadcast; uint64 wrap-around is the mod 2^64
+    with np.errstate(over="ignore"):
+        return ((_A * hashes + _B) >> np.uint64(32)).min(axis=1).astype("<u4")
+
+
+def band_keys(sig: np.ndarray) -> List[Tuple[int, int]]:
+    """(band, bucket) pairs; two chunks sharing any pair are candidate duplicates."""
+    with np.errstate(over="ignore"):
+        buckets = (sig.reshape(BANDS, ROWS).astype(np.uint64) * _ROW_MIX).sum(axis=1)
+    return list(enumerate(buckets.view(np.int64).tolist()))
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+def dedupe(storage, file_id: Optional[int] = None, threshold: float = DEFAULT_THRESHOLD, drop: bool = False, batch_size: int = 2000) -> Dict[str, int]:
+    """
+    Check every not-yet-checked chunk (of file_id, or of the whole database) in
+    insertion order against all canonical chunks seen so far and mark or drop the
+    near-duplicates. drop=True only deletes duplicates of a chunk in the same file;
+    cross-file duplicates are always kept and marked so each file stays complete.
+    Returns counts of what was collapsed.
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    rows = storage.chunks_missing_minhash(file_id)
+    stats = {"checked": 0, "duplicates": 0, "within_file": 0, "cross_file": 0, "dropped": 0}
+
+    for start in range(0, len(rows), batch_size):
+        batch = [(cid, fid, signature(text)) for cid, fid, text in rows[start:start + batch_size]]
+        keyed = [(cid, fid, sig, band_keys(sig) if sig is not None else []) for cid, fid, sig in batch]
+
+        buckets = storage.lsh_lookup({k for *_, keys in keyed for k in keys})
+        known = {
+            cid: (fid, np.frombuffer(blob, dtype="<u4"))
+            for cid, (fid, blob) in storage.get_chunk_minhashes(sorted({c for ids in buckets.values() for c in ids})).items()
+            if blob
+        }
+
+        minhashes, lsh_rows, dup_marks, drop_ids = [], [], [], []
+        for cid, fid, sig, keys in keyed:
+            stats["checked"] += 1
+            minhashes.append((sig.tobytes() if sig is not None else b"", cid))
+            if sig is None:
+                continue
+            best_id, best_sim = None, 0.0
+            for cand in {c for k in keys for c in buckets.get(k, ())}:
+                s = similarity(sig, known[cand][1])
+                if s > best_sim or (s == best_sim and best_id is not None and cand < best_id):
+                    best_id, best_sim = cand, s
+            if best_id is not None and best_sim >= threshold:
+                same_file = known[best_id][0] == fid
+                stats["duplicates"] += 1
+                stats["within_file" if same_file else "cross_file"] += 1
+                if drop and same_file:
+                    drop_ids.append(cid)
+                    stats["dropped"] += 1
+                else:
+                    dup_marks.append((best_id, cid))
+                continue
+            # new canonical chunk: later chunks in this batch can collapse into it
+            known[cid] = (fid, sig)
+            for k in keys:
+                buckets.setdefault(k, []).append(cid)
+                lsh_rows.append((k[0], k[1], cid))
+
+        storage.save_near_duplicates(minhashes, lsh_rows, dup_marks, drop_ids)
+
+    if stats["duplicates"]:
+        logger.info(
+            "Near-duplicates (threshold %.2f) for %s: %d of %d chunks (%d within file, %d across files, %d dropped)",
+            threshold, f"file_id={file_id}" if file_id is not None else "all files",
+            stats["duplicates"], stats["checked"], stats["within_file"], stats["cross_file"], stats["dropped"]
+        )
+    return stats
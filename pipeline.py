@@ -0,0 +1,160 @@
+'''
+Staged pipeline: each stage has its own worker threads and a bounded queue in front
+of it, so slow stages apply backpressure instead of piling up work, and different
+items are in different stages at the same time.
+'''
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_SKIP = object()
+
+
+class Stage:
+    """
+    fn(item) -> item for the next stage; returning None drops the item.
+    ordered=True hands items to this stage in input order (held back until every
+    earlier item has passed or been dropped upstream).
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1, ordered: bool = False):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+        self.ordered = ordered
+
+        self.items = 0
+        self.errors = 0
+        self.busy_s = 0.0
+        self.idle_s = 0.0
+        self.blocked_s = 0.0
+
+
+class _Gate:
+    """Input queue of a stage, releasing items in index order when the stage is ordered."""
+
+    def __init__(self, maxsize: int, ordered: bool):
+        self.queue: "queue.Queue[Tuple[int, Any]]" = queue.Queue(maxsize)
+        self.ordered = ordered
+        self._pending: Dict[int, Any] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def put(self, idx: int, item: Any):
+        if not self.ordered:
+            if item is not _SKIP:
+                self.queue.put((idx, item))
+            return
+        with self._lock:
+            self._pending[idx] = item
+            while self._next in self._pending:
+                ready = self._pending.pop(self._next)
+                if ready is not _SKIP:
+                    self.queue.put((self._next, ready))
+                self._next += 1
+
+
+class Pipeline:
+    """
+    run(items) pushes items through the stages and returns [(result, error)] in input
+    order: result is the last stage's output (None if the item was dropped) and error
+    the exception that stopped it, if any. A failed item doesn't stop the others.
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.wall_s = 0.0
+
+    def run(self, items: List[Any]) -> List[Tuple[Any, Optional[Exception]]]:
+        n = len(items)
+        results: List[Tuple[Any, Optional[Exception]]] = [(None, None)] * n
+        gates = [_Gate(self.queue_size, s.ordered) for s in self.stages]
+        stats_lock = threading.Lock()
+
+        def _work(k: int):
+            stage, gate = self.stages[k], gates[k]
+            nxt = gates[k + 1] if k + 1 < len(gates) else None
+            while True:
+                t_wait = time.perf_counter()
+                idx, item = gate.queue.get()
+                t_start = time.perf_counter()
+                if item is _DONE:
+                    with stats_lock:
+                        stage.idle_s += t_start - t_wait
+                    return
+                try:
+                    out, err = stage.fn(item), None
+                except Exception as e:
+                    logger.exception("Pipeline stage %s failed on item %d", stage.name, idx)
+                    out, err = None, e
+                t_end = time.perf_counter()
+                metrics.observe("stage", t_end - t_start, stage=stage.name)
+                if err is not None or out is None or nxt is None:
+                    results[idx] = (out if nxt is None else None, err)
+                    if nxt is not None:
+                        nxt.put(idx, _SKIP)
+                else:
+                    nxt.put(idx, out)
+                with stats_lock:
+                    stage.items += 1
+                    stage.errors += err is not None
+                    stage.busy_s += t_end - t_start
+                    stage.idle_s += t_start - t_wait
+                    # time spent waiting for room in the next stage's queue
+                    stage.blocked_s += time.perf_counter() - t_end
+
+        t0 = time.perf_counter()
+        threads = []
+        for k, stage in enumerate(self.stages):
+            ts = [threading.Thread(target=_work, args=(k,), name=f"{stage.name}-{i}", daemon=True) for i in range(stage.workers)]
+            for t in ts:
+                t.start()
+            threads.append(ts)
+
+        for idx, item in enumerate(items):
+            gates[0].put(idx, item)
+        # shut the stages down front to back once everything upstream has drained
+        for k, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                gates[k].queue.put((-1, _DONE))
+            for t in threads[k]:
+                t.join()
+        self.wall_s = time.perf_counter() - t0
+        return results
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per stage: items handled, errors, busy seconds and utilization of its workers over the run."""
+        out = []
+        for s in self.stages:
+            capacity = self.wall_s * s.workers
+            out.append({
+                "stage": s.name,
+                "workers": s.workers,
+                "items": s.items,
+                "errors": s.errors,
+                "busy_s": round(s.busy_s, 3),
+                "idle_s": round(s.idle_s, 3),
+                "blocked_s": round(s.blocked_s, 3),
+                "utilization": round(s.busy_s / capacity, 3) if capacity else 0.0,
+            })
+        return out
+
+    def report(self) -> str:
+        lines = [f"Pipeline wall-clock {self.wall_s:.2f}s (sum of stage busy time {sum(s.busy_s for s in self.stages):.2f}s)"]
+        for st in self.stats():
+            lines.append(
+                f"  {st['stage']:<10} workers={st['workers']:<2} items={st['items']:<4} errors={st['errors']:<3} "
+                f"busy={st['busy_s']:.2f}s utilization={st['utilization'] * 100:.0f}% blocked={st['blocked_s']:.2f}s"
+            )
+        return "\n".join(lines)
@@ -1,6 +1,6 @@
 import sys
 from pathlib import Path
-from processing import process_file_bytes, get_file_chunks
+from processing import process_file_path, get_file_chunks, reset_storage
 from connector import generate_file_summary
 
 def main():
@@ -11,10 +11,10 @@ def main():
     if not p.exists():
         print("File not found:", p)
         return
+    reset_storage()
 
     print("Processing file:", p)
-    b = p.read_bytes()
-    summary = process_file_bytes(b, p.name, content_type="")
+    summary = process_file_path(str(p), p.name, content_type="")
     print("Processing result:", summary)
     if "file_id" not in summary:
         print("Error during processing:", summary.get("error"))
@@ -1,50 +1,222 @@
+import hashlib
 import logging
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 from pathlib import Path
-import tempfile
 import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 
 from resource_intake import ResourceIntake
 from file_storage import StorageManager
+import near_dup
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
-storage = StorageManager(base_dir="data", reset_db_on_start=True)
+# STORAGE_PERSIST=1 keeps data/storage.db between runs so unchanged files are reused
+PERSIST = os.getenv("STORAGE_PERSIST", "0") == "1"
 
+# Never reset at import: process-pool workers started with spawn/forkserver
+# re-import the entry script, and would wipe the database mid-run.
+storage = StorageManager(base_dir="data", reset_db_on_start=False)
+
+_EXTRACT_KWARGS = {"chunk_words": 200, "overlap": 0, "ocr_if_empty": True}
+
+
+def reset_storage():
+    """Entry points call this once at start-up: a fresh database unless STORAGE_PERSIST=1."""
+    if not PERSIST:
+        storage.clear()
 
-def process_file_bytes(file_bytes: bytes, original_name: str, content_type: str = "") -> Dict[str, Any]:
-    saved = storage.save_file_from_bytes(file_bytes, original_name, content_type)
-    file_id = saved["file_id"]
 
-    suffix = os.path.splitext(original_name)[1] or ""
-    tmp = None
+def _sha256_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+_claims_lock = threading.Lock()
+_claims: Dict[str, List[Any]] = {}
+
+
+@contextmanager
+def _claim(content_sha256: str):
+    """
+    Serialize ingest of one content hash across threads: a second identical upload waits
+    for the first to finish and then reuses it, instead of seeing an unfinished record and
+    deleting the chunks still being written.
+    """
+    with _claims_lock:
+        entry = _claims.setdefault(content_sha256, [threading.Lock(), 0])
+        entry[1] += 1
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as t:
-            t.write(file_bytes)
-            tmp = t.name
+        with entry[0]:
+            yield
+    finally:
+        with _claims_lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _claims[content_sha256]
+
+
+def _register(original_name: str, size: int, content_type: str, content_sha256: str):
+    """
+    Returns (saved, reused). Byte-identical files map to the same file_id;
+    a file whose previous extraction never finished is re-extracted in place.
+    """
+    existing = storage.find_file_by_hash(content_sha256)
+    if existing is None:
+        return storage.save_file_record(original_name, size, content_type, content_sha256), False
+    saved = {"file_id": existing["id"], "stored_path": existing["stored_name"], "original_name": existing["original_name"], "size": existing["size"]}
+    if existing["ingested_at"] is not None:
+        return saved, True
+    storage.delete_chunks(existing["id"])
+    return saved, False
+
+
+def _process(source, original_name: str, saved: Dict[str, Any], reused: bool = False) -> Dict[str, Any]:
+    file_id = saved["file_id"]
+    if reused:
+        if near_dup.DEFAULT_MODE != "off":
+            # databases from before near-duplicate detection get checked on first reuse
+            near_dup.dedupe(storage, file_id, drop=near_dup.DEFAULT_MODE == "drop")
+        n_chunks = storage.count_chunks(file_id)
+        logger.info("Unchanged file %s already ingested as file_id=%d (%d chunks), skipping extraction", original_name, file_id, n_chunks)
+        return {
+            "file_id": file_id,
+            "original_name": saved["original_name"],
+            "stored_path": saved["stored_path"],
+            "size": saved["size"],
+            "chunks_extracted": n_chunks,
+            "reused": True
+        }
+    # extraction is lazy and runs while _store writes the chunks
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        extracted = ResourceIntake.iter_from_bytes(source, original_name, **_EXTRACT_KWARGS)
+    else:
+        extracted = ResourceIntake.iter_from_path(source, source=original_name, **_EXTRACT_KWARGS)
+    return _store(original_name, saved, extracted)
 
-        extracted = ResourceIntake.extract_from_path(tmp, chunk_words=200, overlap=0, ocr_if_empty=True)
-        storage.save_chunks(file_id, extracted)
+
+def _store(original_name: str, saved: Dict[str, Any], extracted) -> Dict[str, Any]:
+    """Write extracted chunks (an iterable, consumed here) and run near-duplicate detection."""
+    file_id = saved["file_id"]
+    try:
+        n_chunks = storage.save_chunks(file_id, extracted)
+        dup_stats = None
+        if near_dup.DEFAULT_MODE != "off":
+            dup_stats = near_dup.dedupe(storage, file_id, drop=near_dup.DEFAULT_MODE == "drop")
+        storage.mark_ingested(file_id)
 
         summary = {
             "file_id": file_id,
             "original_name": saved["original_name"],
             "stored_path": saved["stored_path"],
             "size": saved["size"],
-            "chunks_extracted": len(extracted)
+            "chunks_extracted": n_chunks
         }
-        logger.info("Processed file %s -> %d chunks", original_name, len(extracted))
+        if dup_stats is not None:
+            summary["near_duplicates"] = dup_stats
+        logger.info("Processed file %s -> %d chunks", original_name, n_chunks)
         return summary
     except Exception as e:
         logger.exception("Failed to process file %s", original_name)
         return {"file_id": file_id, "error": str(e)}
-    finally:
-        if tmp and os.path.exists(tmp):
+
+
+def process_file_bytes(file_bytes: bytes, original_name: str, content_type: str = "") -> Dict[str, Any]:
+    """Extract directly from the in-memory bytes; nothing is written to disk."""
+    sha = hashlib.sha256(file_bytes).hexdigest()
+    with _claim(sha):
+        saved, reused = _register(original_name, len(file_bytes), content_type, sha)
+        return _process(file_bytes, original_name, saved, reused)
+
+
+def process_file_path(path: str, original_name: Optional[str] = None, content_type: str = "") -> Dict[str, Any]:
+    """Extract straight from a file on disk without reading it into memory first."""
+    original_name = original_name or Path(path).name
+    sha = _sha256_file(path)
+    with _claim(sha):
+        saved, reused = _register(original_name, os.path.getsize(path), content_type, sha)
+        return _process(str(path), original_name, saved, reused)
+
+
+def process_file_paths(paths: List[str], workers: int = 1, on_progress: Optional[Callable[[int, int, str, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """
+    Ingest many files, extracting up to `workers` of them at once in a process pool
+    (each OCRing on a single thread, as the processes already use the cores).
+    File records are created up front in input order, so file_ids are deterministic,
+    and all chunks are stored from this thread, so SQLite only ever sees one writer. Returns one process_file_path-style
+    result per path, in input order; a failed file has an "error" key instead of
+    stopping the run. on_progress(done, total, path, result) follows each file.
+    """
+    total = len(paths)
+    results: List[Optional[Dict[str, Any]]] = [None] * total
+    jobs = []
+    # byte-identical paths in the batch share the first one's file_id and result
+    first_by_sha: Dict[str, int] = {}
+    copies: Dict[int, List[int]] = {}
+    for i, path in enumerate(paths):
+        name = Path(path).name
+        try:
+            sha = _sha256_file(path)
+            if sha in first_by_sha:
+                copies[first_by_sha[sha]].append(i)
+                continue
+            saved, reused = _register(name, os.path.getsize(path), "", sha)
+        except Exception as e:
+            logger.exception("Failed to register file %s", path)
+            results[i] = {"error": str(e)}
+            continue
+        first_by_sha[sha] = i
+        copies[i] = []
+        if reused:
+            results[i] = _process(str(path), name, saved, reused=True)
+        else:
+            jobs.append((i, str(path), name, saved))
+
+    done = 0
+
+    def _finish(i, result):
+        nonlocal done
+        for j in [i] + copies.get(i, []):
+            results[j] = result if j == i else dict(result)
+            done += 1
+            if on_progress is not None:
+                on_progress(done, total, str(paths[j]), results[j])
+
+    for i, res in [(i, res) for i, res in enumerate(results) if res is not None]:
+        _finish(i, res)
+
+    n_workers = max(1, min(workers, len(jobs)))
+    if n_workers == 1:
+        for i, path, name, saved in jobs:
+            _finish(i, _process(path, name, saved))
+        return results
+
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        # bounded look-ahead; results are stored in input order as they come in
+        submitted: deque = deque()
+
+        def _drain_one():
+            i, name, saved, fut = submitted.popleft()
             try:
-                os.unlink(tmp)
-            except Exception:
-                pass
+                chunks = fut.result()
+            except Exception as e:
+                logger.exception("Failed to extract file %s", name)
+                _finish(i, {"file_id": saved["file_id"], "error": str(e)})
+                return
+            _finish(i, _store(name, saved, chunks))
+
+        for i, path, name, saved in jobs:
+            submitted.append((i, name, saved, pool.submit(ResourceIntake.extract_from_path, path, source=name, ocr_workers=1, **_EXTRACT_KWARGS)))
+            if len(submitted) >= n_workers * 2:
+                _drain_one()
+        while submitted:
+            _drain_one()
+    logger.info("Ingested %d files across %d worker processes", total, n_workers)
+    return results
 
 
 def get_file_chunks(file_id: int) -> Dict[str, Any]:
@@ -0,0 +1,308 @@
+'''
+Client-side throttling for LLM calls: token buckets for requests/min and tokens/min,
+an adaptive concurrency limit (halved on 429, regrown on success), and jittered
+exponential retry that honours Retry-After.
+'''
+
+import asyncio
+import email.utils
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+import httpx
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    rate units/second refilling up to capacity. reserve(n) books n units and returns
+    how long the caller must wait before using them, so it serves threads and asyncio alike.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._level = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity, self._level + (now - self._last) * self.rate)
+            self._last = now
+            # a request bigger than the bucket waits for a full bucket, then runs
+            n = min(n, self.capacity)
+            self._level -= n
+            return max(0.0, -self._level / self.rate)
+
+    def refund(self, n: float):
+        """Give back units booked on an estimate that turned out too high (negative n charges more)."""
+        with self._lock:
+            self._level = min(self.capacity, self._level + n)
+
+
+class RetryableError(Exception):
+    """Raised by a call to ask for a retry; retry_after is seconds or None."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc: BaseException):
+    """(retryable, status, retry_after) for an exception raised by an LLM call."""
+    if isinstance(exc, RetryableError):
+        return True, None, exc.retry_after
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is not None:
+        retry_after = _parse_retry_after(response.headers.get("retry-after")) if getattr(response, "headers", None) is not None else None
+        return status in RETRYABLE_STATUS, status, retry_after
+    if isinstance(exc, (httpx.TransportError, ConnectionError, TimeoutError)):
+        return True, None, None
+    return False, None, None
+
+
+class RateLimiter:
+    """
+    Shared by every LLM call of the process. max_rpm / max_tpm of 0 disable that bucket.
+    Concurrency starts at max_concurrency, halves on throttling (at most once per
+    cut_cooldown_s) and grows back by one after `recover_after` consecutive successes.
+    """
+
+    def __init__(
+        self,
+        max_rpm: float = 0,
+        max_tpm: float = 0,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        backoff_base_s: float = 1.0,
+        backoff_max_s: float = 60.0,
+        recover_after: int = 10,
+        cut_cooldown_s: float = 1.0,
+    ):
+        self.requests = TokenBucket(max_rpm / 60.0, max_rpm) if max_rpm else None
+        self.tokens = TokenBucket(max_tpm / 60.0, max_tpm) if max_tpm else None
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.recover_after = recover_after
+        self.cut_cooldown_s = cut_cooldown_s
+
+        self._cond = threading.Condition()
+        self.concurrency = self.max_concurrency
+        self._in_flight = 0
+        self._streak = 0
+        self._paused_until = 0.0
+        self._last_cut = float("-inf")
+
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failures = 0
+        self.wait_s = 0.0
+
+    def _try_enter(self) -> float:
+        """0 when a slot was taken, otherwise how long to wait (-1: until a slot frees up)."""
+        with self._cond:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                return pause
+            if self._in_flight < self.concurrency:
+                self._in_flight += 1
+                return 0.0
+            return -1.0
+
+    def _booking(self, tokens: int) -> float:
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def acquire(self, tokens: int = 0):
+        t0 = time.monotonic()
+        with self._cond:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(timeout=pause)
+                elif self._in_flight < self.concurrency:
+                    self._in_flight += 1
+                    break
+                else:
+                    self._cond.wait()
+        delay = self._booking(tokens)
+        if delay:
+            time.sleep(delay)
+        with self._cond:
+            self.wait_s += time.monotonic() - t0
+
+    async def acquire_async(self, tokens: int = 0):
+        t0 = time.monotonic()
+        while True:
+            wait = self._try_enter()
+            if wait == 0.0:
+                break
+            await asyncio.sleep(wait if wait > 0 else 0.01)
+        delay = self._booking(tokens)
+        if delay:
+            await asyncio.sleep(delay)
+        with self._cond:
+            self.wait_s += time.monotonic() - t0
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, tokens_estimated: int = 0, tokens_used: Optional[int] = None):
+        if self.tokens is not None and tokens_used is not None:
+            self.tokens.refund(tokens_estimated - tokens_used)
+        with self._cond:
+            self.calls += 1
+            self._streak += 1
+            if self._streak >= self.recover_after and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+                self._streak = 0
+                self._cond.notify_all()
+
+    def on_throttle(self, retry_after: Optional[float]):
+        with self._cond:
+            self.throttled += 1
+            self._streak = 0
+            now = time.monotonic()
+            # a burst of 429s from one overload window counts as a single signal
+            if now - self._last_cut >= self.cut_cooldown_s:
+                self._last_cut = now
+                new = max(1, self.concurrency // 2)
+                if new < self.concurrency:
+                    logger.warning("LLM provider throttling: concurrency %d -> %d", self.concurrency, new)
+                self.concurrency = new
+            if retry_after:
+                # everyone waits, not only the caller that got the 429
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full-jitter exponential backoff, never shorter than Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max_s, self.backoff_base_s * (2 ** attempt)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max_s))
+        return delay
+
+    def _failed(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to sleep before the next attempt, or None to give up."""
+        retryable, status, retry_after = classify(exc)
+        if status == 429:
+            self.on_throttle(retry_after)
+            metrics.inc("llm_throttled")
+        if not retryable or attempt >= self.max_retries:
+            with self._cond:
+                self.failures += 1
+            return None
+        with self._cond:
+            self.retries += 1
+        metrics.inc("llm_retries")
+        delay = self.backoff(attempt, retry_after)
+        logger.warning("LLM call failed (%s), retry %d/%d in %.1fs", status or type(exc).__name__, attempt + 1, self.max_retries, delay)
+        return delay
+
+    def call(self, fn: Callable[[], Any], tokens: int = 0, usage: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """Run fn under the limiter, retrying transient failures. usage(result) -> tokens really used."""
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                self.release()
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.release()
+            self.on_success(tokens, usage(result) if usage else None)
+            return result
+
+    async def call_async(self, fn: Callable[[], Any], tokens: int = 0, usage: Optional[Callable[[Any], Optional[int]]] = None) -> Any:
+        """asyncio counterpart of call; fn returns an awaitable."""
+        attempt = 0
+        while True:
+            await self.acquire_async(tokens)
+            try:
+                result = await fn()
+            except Exception as e:
+                self.release()
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.release()
+            self.on_success(tokens, usage(result) if usage else None)
+            return result
+
+    def stream(self, fn: Callable[[], Iterable[Any]], tokens: int = 0) -> Iterator[Any]:
+        """
+        Like call for an fn that opens a stream: opening is retried, and the concurrency
+        slot is held until the stream is drained or closed. Failures mid-stream are not
+        retried since part of the output has already been handed out.
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens)
+            try:
+                result = fn()
+            except Exception as e:
+                self.release()
+                delay = self._failed(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            try:
+                yield from result
+            finally:
+                self.release()
+            self.on_success(tokens)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "throttled": self.throttled,
+                "failures": self.failures,
+                "concurrency": self.concurrency,
+                "max_concurrency": self.max_concurrency,
+                "wait_s": round(self.wait_s, 3),
+            }
@@ -1,78 +1,150 @@
 import os
 import logging
+import subprocess
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from io import BytesIO
+from typing import List, Dict, Any, Tuple, Iterator, Optional, Union
 import re
 
 import fitz  # pymupdf
+import numpy as np
 from docx import Document as DocxDocument
 from pptx import Presentation
 from pptx.shapes.group import GroupShape
 from PIL import Image
 import pytesseract
 
+import metrics
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# OCR policy for scanned PDF pages: render resolution, grayscale rendering
+# (1 byte/pixel instead of 3) and how many tesseract processes run at once.
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "1") != "0"
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+
+# With TOKENIZER_PATH set, chunks hold up to CHUNK_TOKENS tokens of that tokenizer
+# instead of chunk_words words.
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "256"))
+
+# extractors take a filesystem path or the file's raw bytes
+PathOrBytes = Union[str, bytes, bytearray, memoryview]
+
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+# same breaks, but capturing the punctuation instead of a (slow) look-behind
+_SENTENCE_END = re.compile(r'([.!?])\s+')
+
 class ResourceIntake:
     @staticmethod
     def _sentence_split(text: str) -> List[str]:
         if not text:
             return []
-        sentences = re.split(r'(?<=[.!?])\s+', text.strip())
+        sentences = _SENTENCE_BREAK.split(text.strip())
         if len(sentences) == 0:
             return [text.strip()]
         return [s.strip() for s in sentences if s.strip()]
 
+    @staticmethod
+    def _split_sentences_fast(text: str) -> List[str]:
+        """Same result as _sentence_split for already-stripped, non-empty text."""
+        parts = _SENTENCE_END.split(text)
+        # parts = [body0, punct0, body1, punct1, ..., last]; every sentence is non-empty
+        sentences = list(map(str.__add__, parts[0:-1:2], parts[1::2]))
+        sentences.append(parts[-1])
+        return sentences
+
     @staticmethod
     def chunk_text(text: str, max_words: int = 200, overlap_sentences: int = 0) -> List[str]:
+        """
+        Greedy sentence packing: each chunk takes sentences while it stays within
+        max_words (always at least one more sentence), and starts with the last
+        overlap_sentences of the previous chunk when that chunk has more sentences.
+        Word counts are computed once; their cumulative sum gives every chunk's
+        end with a binary search instead of re-counting words per sentence.
+        """
+        if not text:
+            return []
+        text = text.strip()
         if not text:
             return []
-        sentences = ResourceIntake._sentence_split(text)
+        sentences = ResourceIntake._split_sentences_fast(text)
+        n = len(sentences)
+        # cum[k] = words in sentences[:k]
+        cum = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, map(str.split, sentences)), dtype=np.int64, count=n), out=cum[1:])
+
         chunks: List[str] = []
-        cur_sentences: List[str] = []
-        cur_words = 0
-
-        for sent in sentences:
-            w = len(sent.split())
-            if cur_words + w <= max_words or not cur_sentences:
-                cur_sentences.append(sent)
-                cur_words += w
+        start, forced_end = 0, 1
+        while True:
+            # longest run from start that fits, but never shorter than forced_end
+            fit_end = int(np.searchsorted(cum, cum[start] + max_words, side="right")) - 1
+            end = min(max(fit_end, forced_end), n)
+            chunks.append(" ".join(sentences[start:end]))
+            if end >= n:
+                break
+            if overlap_sentences and overlap_sentences < end - start:
+                start = end - overlap_sentences
             else:
-                chunks.append(" ".join(cur_sentences).strip())
-                if overlap_sentences and overlap_sentences < len(cur_sentences):
-                    cur_sentences = cur_sentences[-overlap_sentences:].copy()
-                else:
-                    cur_sentences = []
-                cur_words = sum(len(s.split()) for s in cur_sentences)
-                cur_sentences.append(sent)
-                cur_words += w
-
-        if cur_sentences:
-            chunks.append(" ".join(cur_sentences).strip())
-
+                start = end
+            forced_end = end + 1
         return chunks
 
     @staticmethod
     def simple_chunker(text: str, max_words: int = 200, overlap: int = 40) -> List[str]:
         words_per_sentence = 15
         overlap_sentences = max(0, int(overlap / words_per_sentence))
+        if os.getenv("TOKENIZER_PATH"):
+            import token_budget  # imports this module
+
+            if token_budget.get_tokenizer() is not None:
+                return token_budget.chunk_text_by_tokens(text, max_tokens=CHUNK_TOKENS, overlap_sentences=overlap_sentences)
         return ResourceIntake.chunk_text(text, max_words=max_words, overlap_sentences=overlap_sentences)
 
     @staticmethod
-    def extract_docx(path: str, chunk_words: int = 200, overlap: int = 40) -> List[Dict[str, Any]]:
-        results = []
-        doc = DocxDocument(path)
+    def _is_bytes(src: PathOrBytes) -> bool:
+        return isinstance(src, (bytes, bytearray, memoryview))
+
+    @staticmethod
+    def _source_name(src: PathOrBytes, source: Optional[str]) -> str:
+        if source:
+            return os.path.basename(source)
+        if ResourceIntake._is_bytes(src):
+            return "unknown"
+        return os.path.basename(src)
+
+    @staticmethod
+    def _open_stream(src: PathOrBytes):
+        # python-docx / python-pptx accept a path or any binary file-like object
+        return BytesIO(src) if ResourceIntake._is_bytes(src) else src
+
+    @staticmethod
+    def _open_pdf(src: PathOrBytes):
+        if ResourceIntake._is_bytes(src):
+            return fitz.open(stream=src, filetype="pdf")
+        return fitz.open(src)
+
+    @staticmethod
+    def extract_docx(path: PathOrBytes, chunk_words: int = 200, overlap: int = 40, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(ResourceIntake.iter_docx(path, chunk_words, overlap, source))
+
+    @staticmethod
+    def iter_docx(path: PathOrBytes, chunk_words: int = 200, overlap: int = 40, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        source = ResourceIntake._source_name(path, source)
+        doc = DocxDocument(ResourceIntake._open_stream(path))
         # paragraphs
         for i, para in enumerate(doc.paragraphs):
             text = para.text.strip()
             if not text:
                 continue
-            base_meta = {"source": os.path.basename(path), "type": "docx", "para_idx": i}
+            base_meta = {"source": source, "type": "docx", "para_idx": i}
             for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(text, chunk_words, overlap)):
                 meta = dict(base_meta)
                 meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
-                results.append({"text": sub, "meta": meta})
+                yield {"text": sub, "meta": meta}
         # tables: include each cell as its own small chunk
         for t_idx, table in enumerate(doc.tables):
             for r_idx, row in enumerate(table.rows):
@@ -80,12 +152,11 @@ class ResourceIntake:
                     text = cell.text.strip()
                     if not text:
                         continue
-                    base_meta = {"source": os.path.basename(path), "type": "docx_table", "table_idx": t_idx, "row_idx": r_idx, "cell_idx": c_idx}
+                    base_meta = {"source": source, "type": "docx_table", "table_idx": t_idx, "row_idx": r_idx, "cell_idx": c_idx}
                     for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(text, chunk_words, overlap)):
                         meta = dict(base_meta)
                         meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
-                        results.append({"text": sub, "meta": meta})
-        return results
+                        yield {"text": sub, "meta": meta}
 
     @staticmethod
     def _shape_text(shape) -> str:
@@ -109,90 +180,282 @@ class ResourceIntake:
         return ""
 
     @staticmethod
-    def extract_pptx(path: str, chunk_words: int = 200, overlap: int = 40) -> List[Dict[str, Any]]:
-        results = []
-        prs = Presentation(path)
+    def extract_pptx(path: PathOrBytes, chunk_words: int = 200, overlap: int = 40, source: Optional[str] = None) -> List[Dict[str, Any]]:
+        return list(ResourceIntake.iter_pptx(path, chunk_words, overlap, source))
+
+    @staticmethod
+    def iter_pptx(path: PathOrBytes, chunk_words: int = 200, overlap: int = 40, source: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        source = ResourceIntake._source_name(path, source)
+        prs = Presentation(ResourceIntake._open_stream(path))
         for slide_idx, slide in enumerate(prs.slides):
-            # shapes text
-            for shape_idx, shape in enumerate(slide.shapes):
-                try:
-                    text = ResourceIntake._shape_text(shape)
-                    if not text:
-                        continue
-                    base_meta = {
-                        "source": os.path.basename(path),
-                        "type": "pptx",
-                        "slide_idx": slide_idx,
-                        "shape_idx": shape_idx,
-                    }
-                    for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(text, chunk_words, overlap)):
-                        meta = dict(base_meta)
-                        meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
-                        results.append({"text": sub, "meta": meta})
-                except Exception:
-                    logger.exception("Failed to extract shape %s on slide %s", shape_idx, slide_idx)
-            # notes
-            try:
-                if hasattr(slide, "has_notes_slide") and slide.has_notes_slide:
-                    notes_tf = None
+            # a slide's chunks are collected first so the span times parsing, not the consumer
+            slide_chunks = []
+            with metrics.span("extract_page", type="pptx"):
+                # shapes text
+                for shape_idx, shape in enumerate(slide.shapes):
                     try:
-                        notes_tf = slide.notes_slide.notes_text_frame
+                        text = ResourceIntake._shape_text(shape)
+                        if not text:
+                            continue
+                        base_meta = {
+                            "source": source,
+                            "type": "pptx",
+                            "slide_idx": slide_idx,
+                            "shape_idx": shape_idx,
+                        }
+                        for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(text, chunk_words, overlap)):
+                            meta = dict(base_meta)
+                            meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
+                            slide_chunks.append({"text": sub, "meta": meta})
                     except Exception:
+                        logger.exception("Failed to extract shape %s on slide %s", shape_idx, slide_idx)
+                # notes
+                try:
+                    if hasattr(slide, "has_notes_slide") and slide.has_notes_slide:
                         notes_tf = None
-                    if notes_tf:
-                        notes = notes_tf.text.strip()
-                        if notes:
-                            base_meta = {"source": os.path.basename(path), "type": "pptx", "slide_idx": slide_idx, "notes": True}
-                            for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(notes, chunk_words, overlap)):
-                                meta = dict(base_meta)
-                                meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
-                                results.append({"text": sub, "meta": meta})
-            except Exception:
-                logger.exception("Failed to read notes for slide %s in %s", slide_idx, path)
-        return results
+                        try:
+                            notes_tf = slide.notes_slide.notes_text_frame
+                        except Exception:
+                            notes_tf = None
+                        if notes_tf:
+                            notes = notes_tf.text.strip()
+                            if notes:
+                                base_meta = {"source": source, "type": "pptx", "slide_idx": slide_idx, "notes": True}
+                                for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(notes, chunk_words, overlap)):
+                                    meta = dict(base_meta)
+                                    meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
+                                    slide_chunks.append({"text": sub, "meta": meta})
+                except Exception:
+                    logger.exception("Failed to read notes for slide %s in %s", slide_idx, source)
+            yield from slide_chunks
 
     @staticmethod
-    def extract_pdf(path: str, ocr_if_empty: bool = True, chunk_words: int = 200, overlap: int = 40) -> List[Dict[str, Any]]:
+    def _pdf_page_chunks(text: str, page_num: int, source: str, chunk_words: int, overlap: int) -> List[Dict[str, Any]]:
         results = []
+        if text:
+            base_meta = {"source": source, "type": "pdf", "page": page_num + 1}
+            for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(text, chunk_words, overlap)):
+                meta = dict(base_meta)
+                meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
+                results.append({"text": sub, "meta": meta})
+        return results
+
+    @staticmethod
+    def _render_for_ocr(page, dpi: int, grayscale: bool):
+        """Render a page for OCR. The PIL image wraps the pixmap's buffer without copying it."""
+        if grayscale:
+            pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            mode = "L"
+        else:
+            pix = page.get_pixmap(dpi=dpi, alpha=False)
+            mode = "RGB"
+        img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+        return pix, img
+
+    @staticmethod
+    def _tesseract(img, single_thread: bool) -> str:
+        if not single_thread:
+            return pytesseract.image_to_string(img)
+        # pooled pages each get a single-threaded tesseract so the workers don't oversubscribe
+        # the cores; pytesseract always passes os.environ, so the call is made here instead
+        buf = BytesIO()
+        img.save(buf, format="PNG")
+        result = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, "stdin", "stdout"],
+            input=buf.getvalue(),
+            capture_output=True,
+            env={**os.environ, "OMP_THREAD_LIMIT": "1"},
+        )
+        if result.returncode != 0:
+            raise pytesseract.TesseractError(result.returncode, result.stderr.decode("utf-8", "replace"))
+        return result.stdout.decode("utf-8", "replace")
+
+    @staticmethod
+    def _ocr_image(pix, img, page_num: int, source: str, single_thread: bool = False) -> str:
+        # pix is passed along to keep the buffer behind img alive; closing img
+        # releases its view of that buffer so the pixmap can be freed
         try:
-            doc = fitz.open(path)
+            with metrics.span("ocr_page"):
+                return ResourceIntake._tesseract(img, single_thread).strip()
         except Exception:
-            logger.exception("Failed to open PDF %s", path)
-            return results
+            logger.exception("OCR fallback failed for %s page %s", source, page_num + 1)
+            return ""
+        finally:
+            img.close()
 
-        for page_num in range(len(doc)):
-            try:
-                page = doc[page_num]
-                text = page.get_text("text").strip()
-                if not text and ocr_if_empty:
+    @staticmethod
+    def _iter_pdf_pages(
+        doc,
+        pages: range,
+        source: str,
+        ocr_if_empty: bool,
+        chunk_words: int,
+        overlap: int,
+        ocr_workers: int = 1,
+        ocr_dpi: int = OCR_DPI,
+        ocr_grayscale: bool = OCR_GRAYSCALE,
+    ) -> Iterator[Dict[str, Any]]:
+        # (page_num, extracted text or pending OCR future), in page order
+        pending: deque = deque()
+        pool = None
+        in_flight: deque = deque()
+
+        def _ready():
+            # chunks of leading pages whose text is known; keeps output in page order
+            while pending and not (isinstance(pending[0][1], Future) and not pending[0][1].done()):
+                page_num, text = pending.popleft()
+                if isinstance(text, Future):
+                    text = text.result()
+                yield from ResourceIntake._pdf_page_chunks(text, page_num, source, chunk_words, overlap)
+
+        try:
+            for page_num in pages:
+                # pages sent to the OCR pool only count their rendering here
+                with metrics.span("extract_page", type="pdf"):
                     try:
-                        pix = page.get_pixmap(dpi=200)
-                        mode = "RGB" if pix.n < 4 else "RGBA"
-                        img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
-                        text = pytesseract.image_to_string(img).strip()
+                        page = doc[page_num]
+                        text = page.get_text("text").strip()
+                        if text or not ocr_if_empty:
+                            pending.append((page_num, text))
+                        elif ocr_workers <= 1:
+                            pix, img = ResourceIntake._render_for_ocr(page, ocr_dpi, ocr_grayscale)
+                            pending.append((page_num, ResourceIntake._ocr_image(pix, img, page_num, source)))
+                        else:
+                            # pytesseract shells out to tesseract, so threads give real parallelism;
+                            # rendering the next page overlaps with recognition of earlier ones
+                            if pool is None:
+                                pool = ThreadPoolExecutor(max_workers=ocr_workers)
+                            while len(in_flight) >= ocr_workers * 2:
+                                in_flight.popleft().result()
+                            pix, img = ResourceIntake._render_for_ocr(page, ocr_dpi, ocr_grayscale)
+                            fut = pool.submit(ResourceIntake._ocr_image, pix, img, page_num, source, True)
+                            in_flight.append(fut)
+                            pending.append((page_num, fut))
                     except Exception:
-                        logger.exception("OCR fallback failed for %s page %s", path, page_num + 1)
-                        text = ""
-                if text:
-                    base_meta = {"source": os.path.basename(path), "type": "pdf", "page": page_num + 1}
-                    for chunk_idx, sub in enumerate(ResourceIntake.simple_chunker(text, chunk_words, overlap)):
-                        meta = dict(base_meta)
-                        meta.update({"chunk_idx": chunk_idx, "excerpt": sub[:200]})
-                        results.append({"text": sub, "meta": meta})
-            except Exception:
-                logger.exception("Error extracting page %s from %s", page_num + 1, path)
-        return results
+                        logger.exception("Error extracting page %s from %s", page_num + 1, source)
+                yield from _ready()
+            for page_num, text in pending:
+                if isinstance(text, Future):
+                    text = text.result()
+                yield from ResourceIntake._pdf_page_chunks(text, page_num, source, chunk_words, overlap)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
 
     @staticmethod
-    def extract_from_path(path: str, **kwargs) -> List[Dict[str, Any]]:
-        p = Path(path)
-        ext = p.suffix.lower()
+    def _pdf_shards(n_pages: int, workers: int, pages_per_shard: int = 8) -> List[Tuple[int, int]]:
+        # several shards per worker so uneven pages (e.g. OCR) still balance out
+        size = max(1, min(pages_per_shard, -(-n_pages // (workers * 4))))
+        return [(start, min(start + size, n_pages)) for start in range(0, n_pages, size)]
+
+    @staticmethod
+    def extract_pdf(path: PathOrBytes, ocr_if_empty: bool = True, chunk_words: int = 200, overlap: int = 40, **kwargs) -> List[Dict[str, Any]]:
+        return list(ResourceIntake.iter_pdf(path, ocr_if_empty, chunk_words, overlap, **kwargs))
+
+    @staticmethod
+    def iter_pdf(
+        path: PathOrBytes,
+        ocr_if_empty: bool = True,
+        chunk_words: int = 200,
+        overlap: int = 40,
+        workers: int = 1,
+        ocr_workers: int = OCR_WORKERS,
+        ocr_dpi: int = OCR_DPI,
+        ocr_grayscale: bool = OCR_GRAYSCALE,
+        source: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        source = ResourceIntake._source_name(path, source)
+        try:
+            doc = ResourceIntake._open_pdf(path)
+        except Exception:
+            logger.exception("Failed to open PDF %s", source)
+            return
+
+        n_pages = len(doc)
+        if workers <= 1 or n_pages < 2:
+            try:
+                yield from ResourceIntake._iter_pdf_pages(
+                    doc, range(n_pages), source, ocr_if_empty, chunk_words, overlap, ocr_workers, ocr_dpi, ocr_grayscale
+                )
+            finally:
+                doc.close()
+            return
+        doc.close()
+
+        # each worker re-opens the document and extracts its own page range;
+        # shards are yielded in submission order, so chunks come back in page order.
+        # In-memory documents are handed to each worker once, via the pool initializer.
+        in_memory = ResourceIntake._is_bytes(path)
+        shards = ResourceIntake._pdf_shards(n_pages, workers)
+        n_workers = min(workers, len(shards))
+        # the process pool already provides the parallelism, so OCR runs inline per shard
+        args = [
+            (None if in_memory else path, source, start, stop, ocr_if_empty, chunk_words, overlap, ocr_dpi, ocr_grayscale)
+            for start, stop in shards
+        ]
+        pool_kwargs = {"initializer": _init_pdf_worker, "initargs": (bytes(path),)} if in_memory else {}
+        with ProcessPoolExecutor(max_workers=n_workers, **pool_kwargs) as pool:
+            # bounded look-ahead so finished shards don't pile up in memory
+            submitted: deque = deque()
+            for a in args:
+                submitted.append(pool.submit(_extract_pdf_shard, a))
+                if len(submitted) >= n_workers * 2:
+                    yield from submitted.popleft().result()
+            while submitted:
+                yield from submitted.popleft().result()
+        logger.info("Extracted %d pages of %s across %d workers", n_pages, source, n_workers)
+
+    @staticmethod
+    def extract_from_path(path: str, workers: int = 1, **kwargs) -> List[Dict[str, Any]]:
+        """workers > 1 extracts PDF pages in parallel across a process pool."""
+        return list(ResourceIntake.iter_from_path(path, workers=workers, **kwargs))
+
+    @staticmethod
+    def iter_from_path(path: str, workers: int = 1, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Like extract_from_path, but yields chunks as pages/slides/paragraphs are parsed."""
+        return ResourceIntake._iter_by_type(path, path, workers, **kwargs)
+
+    @staticmethod
+    def iter_from_bytes(data: bytes, name: str, workers: int = 1, **kwargs) -> Iterator[Dict[str, Any]]:
+        """Extract straight from an in-memory file; name supplies the type and the meta source."""
+        return ResourceIntake._iter_by_type(data, name, workers, **kwargs)
+
+    @staticmethod
+    def _iter_by_type(src: PathOrBytes, name: str, workers: int = 1, **kwargs) -> Iterator[Dict[str, Any]]:
+        ext = Path(name).suffix.lower()
+        # PDF-only options
+        pdf_kwargs = {k: kwargs.pop(k) for k in ("ocr_if_empty", "ocr_workers") if k in kwargs}
+        kwargs.setdefault("source", name)
         if ext == ".docx":
-            return ResourceIntake.extract_docx(path, **kwargs)
+            return ResourceIntake.iter_docx(src, **kwargs)
         if ext in (".pptx", ".ppt"):
-            return ResourceIntake.extract_pptx(path, **kwargs)
+            return ResourceIntake.iter_pptx(src, **kwargs)
         if ext == ".pdf":
-            return ResourceIntake.extract_pdf(path, **kwargs)
+            return ResourceIntake.iter_pdf(src, workers=workers, **pdf_kwargs, **kwargs)
         logger.warning("Unsupported file type: %s", ext)
+        return iter([])
+
+
+_worker_pdf_bytes: Optional[bytes] = None
+
+
+def _init_pdf_worker(data: bytes):
+    global _worker_pdf_bytes
+    _worker_pdf_bytes = data
+
+
+def _extract_pdf_shard(args) -> List[Dict[str, Any]]:
+    """Process-pool entry point: open the PDF in this worker and extract pages [start, stop)."""
+    path, source, start, stop, ocr_if_empty, chunk_words, overlap, ocr_dpi, ocr_grayscale = args
+    try:
+        doc = ResourceIntake._open_pdf(path if path is not None else _worker_pdf_bytes)
+    except Exception:
+        logger.exception("Failed to open PDF %s in worker", source)
         return []
+    try:
+        return list(ResourceIntake._iter_pdf_pages(
+            doc, range(start, stop), source, ocr_if_empty, chunk_words, overlap, 1, ocr_dpi, ocr_grayscale
+        ))
+    finally:
+        doc.close()
     
\ No newline at end of file
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
 from exec import run
+from processing import reset_storage
 
 UPLOAD_DIR = "uploads"
 
@@ -16,6 +17,7 @@ def main():
         print("No files found in uploads/")
         return
 
+    reset_storage()
     run(files)
 
 
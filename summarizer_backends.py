@@ -0,0 +1,179 @@
+'''
+Summarizer backends behind info_sum.summarize_text, selected with SUMMARIZER_BACKEND:
+- hf:    Hugging Face inference providers (default, defined in info_sum)
+- local: a small chat model from a local directory, run in-process on CPU with transformers/torch
+- stub:  deterministic, instant output for offline runs and throughput tests
+'''
+
+import abc
+import hashlib
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.getenv("SUMMARIZER_BACKEND", "hf")
+
+# local backend: directory holding a small instruction-tuned causal LM, e.g. from
+# `huggingface-cli download Qwen/Qwen2.5-0.5B-Instruct --local-dir models/qwen2.5-0.5b`
+LOCAL_MODEL = os.getenv("SUMMARIZER_LOCAL_MODEL")
+# max chunks generated together in one forward pass, and how long to wait to fill a batch
+LOCAL_BATCH_SIZE = int(os.getenv("SUMMARIZER_LOCAL_BATCH_SIZE", "8"))
+LOCAL_BATCH_WAIT_MS = float(os.getenv("SUMMARIZER_LOCAL_BATCH_WAIT_MS", "20"))
+
+Messages = List[Dict[str, str]]
+
+
+class SummarizerBackend(abc.ABC):
+    """
+    A chat-completion engine. Subclasses implement complete(); complete_batch() and
+    stream() fall back to it. model/provider identify the backend in cache keys.
+    """
+    name = "base"
+    model = ""
+    provider: Optional[str] = None
+
+    @abc.abstractmethod
+    def complete(self, messages: Messages, *, max_tokens: int, temperature: float) -> str:
+        ...
+
+    def complete_batch(self, batch: List[Messages], *, max_tokens: int, temperature: float) -> List[str]:
+        return [self.complete(m, max_tokens=max_tokens, temperature=temperature) for m in batch]
+
+    def stream(self, messages: Messages, *, max_tokens: int, temperature: float) -> Iterator[str]:
+        yield self.complete(messages, max_tokens=max_tokens, temperature=temperature)
+
+
+class StubBackend(SummarizerBackend):
+    """
+    No model: returns the first sentence-ish words of the user prompt under a heading,
+    so output is deterministic, cheap and still shrinks at every level of the tree.
+    """
+    name = "stub"
+    model = "stub"
+    provider = "stub"
+
+    def __init__(self, words: int = 40):
+        self.words = words
+
+    def complete(self, messages: Messages, *, max_tokens: int, temperature: float) -> str:
+        # skip the instruction line, keep the chunks
+        text = messages[-1]["content"].split("\n\n", 1)[-1]
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:8]
+        words = text.split()[:min(self.words, max_tokens)]
+        return f"## Summary {digest}\n- " + " ".join(words)
+
+    def stream(self, messages: Messages, *, max_tokens: int, temperature: float) -> Iterator[str]:
+        out = self.complete(messages, max_tokens=max_tokens, temperature=temperature)
+        first, *rest = out.split(" ")
+        yield first
+        for word in rest:
+            yield " " + word
+
+
+class LocalTransformersBackend(SummarizerBackend):
+    """
+    Runs the model in the LOCAL_MODEL directory in this process with transformers on CPU,
+    without touching the network. Concurrent callers (the
+    connector's worker threads) are gathered by a single generation thread into padded
+    batches of up to batch_size prompts, so several chunks share each forward pass.
+    """
+    name = "local"
+    provider = "local"
+
+    def __init__(self, model: Optional[str] = LOCAL_MODEL, batch_size: int = LOCAL_BATCH_SIZE, batch_wait_ms: float = LOCAL_BATCH_WAIT_MS):
+        if not model or not os.path.isdir(model):
+            raise ValueError(
+                f"SUMMARIZER_LOCAL_MODEL must be a local model directory (got {model!r}); "
+                "fetch one with `huggingface-cli download <model> --local-dir <dir>`"
+            )
+        # heavy optional dependencies, only needed for this backend
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.batch_wait_s = batch_wait_ms / 1000.0
+        self._torch = torch
+        self._tokenizer = AutoTokenizer.from_pretrained(model, local_files_only=True)
+        # decoder-only models must be left-padded so every prompt ends at the same position
+        self._tokenizer.padding_side = "left"
+        if self._tokenizer.pad_token is None:
+            self._tokenizer.pad_token = self._tokenizer.eos_token
+        self._model = AutoModelForCausalLM.from_pretrained(model, dtype=torch.float32, local_files_only=True)
+        self._model.eval()
+
+        self._queue: "queue.Queue[Tuple[Messages, int, float, Future]]" = queue.Queue()
+        self._worker = threading.Thread(target=self._serve, name="local-summarizer", daemon=True)
+        self._worker.start()
+        logger.info("Loaded local summarizer model %s (batch size %d)", model, self.batch_size)
+
+    def complete(self, messages: Messages, *, max_tokens: int, temperature: float) -> str:
+        fut: Future = Future()
+        self._queue.put((messages, max_tokens, temperature, fut))
+        return fut.result()
+
+    def complete_batch(self, batch: List[Messages], *, max_tokens: int, temperature: float) -> List[str]:
+        futures = []
+        for messages in batch:
+            fut: Future = Future()
+            self._queue.put((messages, max_tokens, temperature, fut))
+            futures.append(fut)
+        return [f.result() for f in futures]
+
+    def _serve(self):
+        while True:
+            pending = [self._queue.get()]
+            # give other threads a moment to submit, then take everything compatible
+            try:
+                while len(pending) < self.batch_size:
+                    pending.append(self._queue.get(timeout=self.batch_wait_s))
+            except queue.Empty:
+                pass
+            groups: Dict[Tuple[int, float], list] = {}
+            for item in pending:
+                groups.setdefault((item[1], item[2]), []).append(item)
+            for (max_tokens, temperature), items in groups.items():
+                try:
+                    outs = self._generate([it[0] for it in items], max_tokens, temperature)
+                except Exception as e:
+                    for it in items:
+                        it[3].set_exception(e)
+                    continue
+                for it, out in zip(items, outs):
+                    it[3].set_result(out)
+
+    def _generate(self, batch: List[Messages], max_tokens: int, temperature: float) -> List[str]:
+        prompts = [self._tokenizer.apply_chat_template(m, tokenize=False, add_generation_prompt=True) for m in batch]
+        enc = self._tokenizer(prompts, return_tensors="pt", padding=True, add_special_tokens=False)
+        kwargs = {"max_new_tokens": max_tokens, "pad_token_id": self._tokenizer.pad_token_id}
+        if temperature > 0:
+            kwargs.update(do_sample=True, temperature=temperature)
+        else:
+            kwargs.update(do_sample=False)
+        with self._torch.inference_mode():
+            out = self._model.generate(**enc, **kwargs)
+        new_tokens = out[:, enc["input_ids"].shape[1]:]
+        return [t.strip() for t in self._tokenizer.batch_decode(new_tokens, skip_special_tokens=True)]
+
+
+_factories: Dict[str, Callable[[], SummarizerBackend]] = {
+    "stub": StubBackend,
+    "local": LocalTransformersBackend,
+}
+
+
+def register_backend(name: str, factory: Callable[[], SummarizerBackend]):
+    _factories[name] = factory
+
+
+def create_backend(name: str = DEFAULT_BACKEND) -> SummarizerBackend:
+    try:
+        factory = _factories[name]
+    except KeyError:
+        raise ValueError(f"unknown SUMMARIZER_BACKEND {name!r}; choose from {', '.join(sorted(_factories))}") from None
+    return factory()
@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# modules open data/storage.db relative to the working directory at import time;
+# keep the test run away from the checkout's own data/
+_workdir = tempfile.mkdtemp(prefix="studybuddy-tests-")
+os.chdir(_workdir)
+os.environ.setdefault("HF_TOKEN", "test")
+os.environ["SUMMARIZER_CACHE"] = "0"
+os.environ["SUMMARIZER_BACKEND"] = "stub"
+os.environ.setdefault("STORAGE_PERSIST", "1")
@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+import connector
+import info_sum
+from llm_cache import LLMCache
+
+
+class _FakeClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, *, messages, **kwargs):
+        text = messages[-1]["content"]
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=f"summary of {len(text.split())} words"))])
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(info_sum, "get_client", _FakeClient)
+
+
+def _texts(n):
+    return [f"SOURCE: notes.docx | page: 1 | chunk: {i}\nchunk {i} " + "word " * 200 for i in range(n)]
+
+
+def _run(texts):
+    stats = {}
+    connector.summarize_large_text(texts, batch_words=500, max_workers=2, stats=stats)
+    return stats
+
+
+def test_batches_are_memoized_in_the_llm_cache(tmp_path, monkeypatch):
+    cache = LLMCache(base_dir=str(tmp_path))
+    monkeypatch.setattr(info_sum, "_cache", cache)
+    texts = _texts(12)
+
+    first = _run(texts)
+    assert first["memo_hits"] == 0 and first["llm_calls"] > first["batches"]
+
+    again = _run(texts)
+    assert again["llm_calls"] == 0
+    assert again["memo_hits"] == first["llm_calls"]
+
+    edited = list(texts)
+    edited[-1] += " an edit at the end"
+    assert _run(edited)["llm_calls"] < first["llm_calls"]
+
+
+def test_memoize_off_without_a_cache(monkeypatch):
+    monkeypatch.setattr(info_sum, "_cache", None)
+    monkeypatch.setattr(info_sum, "CACHE_ENABLED", False)
+    texts = _texts(6)
+    assert _run(texts)["memo_hits"] == 0
+    assert _run(texts)["memo_hits"] == 0
+
+
+def test_content_boundaries_are_opt_in(monkeypatch):
+    texts = _texts(40)
+    plain = connector._make_batches(texts, output_format="markdown", batch_words=1000, batch_tokens=None, max_tokens=1500)
+    assert len(plain) == len(connector._batch_texts_by_words(texts, max_words=1000))
+    monkeypatch.setattr(connector, "DEFAULT_CONTENT_BOUNDARIES", True)
+    bounded = connector._make_batches(texts, output_format="markdown", batch_words=1000, batch_tokens=None, max_tokens=1500)
+    assert len(bounded) >= len(plain)
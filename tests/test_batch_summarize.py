@@ -0,0 +1,33 @@
+import time
+
+import pytest
+
+import connector
+
+
+def _texts(n):
+    return [f"part-{i} " + "word " * 120 for i in range(n)]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    def summarize_text(text, **kwargs):
+        i = int(text.split("part-")[1].split()[0])
+        # later batches finish first
+        time.sleep(0.002 * (8 - i))
+        if i in (2, 5):
+            raise RuntimeError(f"boom {i}")
+        return f"summary {i}"
+
+    monkeypatch.setattr(connector, "summarize_text", summarize_text)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_results_keep_batch_order_with_error_placeholders(fake_llm, workers):
+    final, batches = connector.summarize_large_text(_texts(8), batch_words=100, hierarchical_final=False, max_workers=workers)
+
+    expected = [f"summary {i}" for i in range(8)]
+    expected[2] = "[ERROR in internal batch 2: boom 2]"
+    expected[5] = "[ERROR in internal batch 5: boom 5]"
+    assert batches == expected
+    assert final == "\n\n".join(expected)
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from benchmarks import _legacy_chunk_text
+from resource_intake import ResourceIntake
+
+EDGE_TEXTS = [
+    "",
+    "   \n\t ",
+    "no sentence end at all",
+    "One. Two! Three? Four.",
+    "  leading and trailing space.  Then more.\n\n",
+    "Ellipsis... then more. Abbrev. e.g. this?! and that.",
+    "!!! ??? ...",
+    "word " * 500 + ". short one. " + "word " * 50,
+    "Line one.\nLine two.\r\nLine three.\tTabbed. Non-breaking.  Em space.",
+    "Numbers 3.14 and 2.5 stay. Decimal end 1.",
+    "Mixed 📚 unicode émojis. Ünïcode text! Fin?",
+]
+
+
+def _random_text(rng):
+    words = ["lecture", "entropy", "a", "of", "proof", "x", "the"]
+    parts = []
+    for _ in range(rng.randint(1, 60)):
+        parts.append(" ".join(rng.choice(words) for _ in range(rng.randint(1, 40))) + rng.choice([".", "!", "?", "", ".."]))
+    return rng.choice([" ", "  ", "\n", " \n "]).join(parts)
+
+
+@pytest.mark.parametrize("max_words, overlap", [(0, 0), (1, 0), (5, 1), (20, 2), (200, 0), (200, 5), (10, 50)])
+@pytest.mark.parametrize("text", EDGE_TEXTS)
+def test_matches_the_original_on_edge_inputs(text, max_words, overlap):
+    assert ResourceIntake.chunk_text(text, max_words, overlap) == _legacy_chunk_text(text, max_words, overlap)
+
+
+def test_matches_the_original_on_random_text():
+    rng = random.Random(0)
+    for _ in range(300):
+        text = _random_text(rng)
+        max_words, overlap = rng.randint(0, 120), rng.randint(0, 4)
+        assert ResourceIntake.chunk_text(text, max_words, overlap) == _legacy_chunk_text(text, max_words, overlap)
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+from huggingface_hub.utils import get_session
+from huggingface_hub.utils._http import default_async_client_factory, default_client_factory
+
+import info_sum
+
+
+def _hook_names(client):
+    return {name: [h.__name__ for h in hooks] for name, hooks in client.event_hooks.items()}
+
+
+@pytest.fixture
+def unconfigured(monkeypatch):
+    monkeypatch.setattr(info_sum, "_pool_configured", False)
+    monkeypatch.setattr(info_sum, "_client", None)
+    yield
+    info_sum.close_clients()
+
+
+def test_pooled_clients_keep_hub_event_hooks(unconfigured):
+    info_sum.configure_client_pool(size=3, timeout=30)
+    session = get_session()
+    assert _hook_names(session) == _hook_names(default_client_factory())
+    assert session._transport._pool._max_connections == 3
+
+    async_factory = info_sum._pooled_factory(default_async_client_factory, httpx.AsyncClient, info_sum._pool_limits(3), httpx.Timeout(30))
+    assert _hook_names(async_factory()) == _hook_names(default_async_client_factory())
+
+
+def test_import_leaves_the_hub_client_factory_alone():
+    root = os.path.dirname(os.path.abspath(info_sum.__file__))
+    code = (
+        "from huggingface_hub.utils import _http\n"
+        "import info_sum\n"
+        "assert _http._GLOBAL_CLIENT_FACTORY is _http.default_client_factory\n"
+        "info_sum.get_client()\n"
+        "assert _http._GLOBAL_CLIENT_FACTORY is not _http.default_client_factory\n"
+    )
+    subprocess.run([sys.executable, "-c", code], env=dict(os.environ, PYTHONPATH=root), check=True)
+
+
+def test_missing_private_factories_fall_back_to_the_hub_defaults(unconfigured, monkeypatch):
+    calls = []
+    monkeypatch.setattr(info_sum, "default_client_factory", None)
+    monkeypatch.setattr(info_sum, "set_client_factory", calls.append)
+    assert info_sum.get_client() is not None
+    assert info_sum._pool_configured and calls == []
@@ -0,0 +1,42 @@
+import export_utils
+
+DOC = "\\documentclass{article}\n\\begin{document}\nHello\n\\end{document}\n"
+
+
+def _fake_compiler(monkeypatch, calls):
+    def compile_latex(lt_text, out_pdf):
+        calls.append(lt_text)
+        out_pdf.parent.mkdir(parents=True, exist_ok=True)
+        out_pdf.write_bytes(b"%PDF " + lt_text.encode())
+
+    monkeypatch.setattr(export_utils, "_compile_latex", compile_latex)
+
+
+def test_unchanged_document_is_copied_from_the_pdf_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_utils, "LATEX_CACHE_ENABLED", True)
+    monkeypatch.setattr(export_utils, "LATEX_CACHE_DIR", str(tmp_path / "cache"))
+    calls = []
+    _fake_compiler(monkeypatch, calls)
+
+    first = export_utils.try_make_pdf_from_latex(DOC, str(tmp_path / "out"), "one")
+    second = export_utils.try_make_pdf_from_latex(DOC, str(tmp_path / "out"), "two")
+    export_utils.try_make_pdf_from_latex(DOC.replace("Hello", "Changed"), str(tmp_path / "out"), "three")
+
+    assert len(calls) == 2
+    assert first.endswith("one.pdf") and second.endswith("two.pdf")
+    assert open(first, "rb").read() == open(second, "rb").read()
+
+
+def test_cache_is_pruned_least_recently_used_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_utils, "LATEX_CACHE_ENABLED", True)
+    monkeypatch.setattr(export_utils, "LATEX_CACHE_DIR", str(tmp_path / "cache"))
+    # room for about two of the fake PDFs
+    monkeypatch.setattr(export_utils, "LATEX_CACHE_MAX_MB", 2 * len(b"%PDF " + DOC.encode()) / (1024 * 1024))
+    calls = []
+    _fake_compiler(monkeypatch, calls)
+
+    for i in range(4):
+        export_utils.try_make_pdf_from_latex(DOC.replace("Hello", f"Doc{i}"), str(tmp_path / "out"), f"doc{i}")
+    assert len(list((tmp_path / "cache").glob("*.pdf"))) <= 2
+    export_utils.try_make_pdf_from_latex(DOC.replace("Hello", "Doc3"), str(tmp_path / "out"), "again")
+    assert len(calls) == 4
@@ -0,0 +1,61 @@
+import sqlite3
+import threading
+import time
+
+from llm_cache import LLMCache
+
+
+def _bytes(cache):
+    return cache.stats()["bytes"]
+
+
+def test_put_tracks_size_and_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(base_dir=str(tmp_path), max_bytes=300, max_age_s=None)
+    for key in "abc":
+        cache.put(key, "x" * 100)
+    assert cache._total_bytes == _bytes(cache) == 300
+
+    cache.get("a")
+    cache.put("d", "x" * 100)
+    assert cache.get("b") is None
+    assert all(cache.get(k) for k in "acd")
+    assert cache._total_bytes == _bytes(cache) == 300
+
+    # replacing an entry counts only the difference
+    cache.put("a", "x" * 50)
+    assert cache._total_bytes == _bytes(cache) == 250
+    assert cache.stats()["evictions"] == 1
+
+
+def test_total_is_read_back_on_open(tmp_path):
+    LLMCache(base_dir=str(tmp_path)).put("a", "x" * 40)
+    assert LLMCache(base_dir=str(tmp_path))._total_bytes == 40
+
+
+def test_expired_entries_are_swept_periodically(tmp_path):
+    cache = LLMCache(base_dir=str(tmp_path), max_age_s=60, sweep_every=3)
+    cache.put("old", "x" * 10)
+    conn = sqlite3.connect(str(cache.db_path))
+    with conn:
+        conn.execute("UPDATE llm_cache SET created_at = ?", (time.time() - 120,))
+    conn.close()
+
+    cache.put("a", "y")
+    assert cache.stats()["entries"] == 2
+    cache.put("b", "z")
+    assert cache.stats()["entries"] == 2
+    assert cache._total_bytes == _bytes(cache) == 2
+
+
+def test_connection_is_reused_per_thread_in_wal_mode(tmp_path):
+    cache = LLMCache(base_dir=str(tmp_path))
+    conn = cache._conn()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    cache.put("a", "x")
+    assert cache._conn() is conn
+
+    seen = []
+    t = threading.Thread(target=lambda: seen.append(cache._conn()))
+    t.start()
+    t.join()
+    assert seen[0] is not conn
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def enabled():
+    was = metrics.ENABLED
+    metrics.reset()
+    metrics.enable(True)
+    yield
+    metrics.enable(was)
+    metrics.reset()
+
+
+def test_disabled_metrics_record_nothing():
+    was = metrics.ENABLED
+    metrics.enable(False)
+    try:
+        assert metrics.span("a", type="x") is metrics.span("b") is metrics._NOOP
+        with metrics.span("a", type="x"):
+            metrics.inc("items")
+            metrics.observe("stage", 1.0)
+        assert metrics.snapshot() == {"counters": [], "spans": []}
+    finally:
+        metrics.enable(was)
+
+
+def test_json_export(enabled):
+    metrics.inc("items", 2, type="pdf")
+    metrics.inc("items", type="pdf")
+    metrics.observe("stage", 0.2, stage="extract")
+    metrics.observe("stage", 3.0, stage="extract")
+    with pytest.raises(ValueError):
+        with metrics.span("compile"):
+            raise ValueError
+
+    snap = json.loads(metrics.to_json())
+    assert snap["counters"] == [
+        {"name": "compile_errors", "labels": {}, "value": 1},
+        {"name": "items", "labels": {"type": "pdf"}, "value": 3},
+    ]
+    stage = next(s for s in snap["spans"] if s["name"] == "stage")
+    assert stage["labels"] == {"stage": "extract"}
+    assert (stage["count"], stage["sum_s"], stage["mean_s"], stage["max_s"]) == (2, 3.2, 1.6, 3.0)
+    assert stage["buckets"]["0.25"] == 1 and stage["buckets"]["5.0"] == 1
+    assert sum(stage["buckets"].values()) == 2
+    assert [s["name"] for s in snap["spans"]] == ["compile", "stage"]
+
+
+def test_prometheus_export(enabled):
+    metrics.inc("llm-retries", 2)
+    metrics.observe("stage", 0.2, stage='say "hi"')
+    lines = metrics.to_prometheus().splitlines()
+
+    assert lines[:2] == ["# TYPE pipeline_llm_retries_total counter", "pipeline_llm_retries_total 2"]
+    assert lines[2] == "# TYPE pipeline_stage_seconds histogram"
+    label = 'stage="say \\"hi\\""'
+    assert f'pipeline_stage_seconds_bucket{{{label},le="0.1"}} 0' in lines
+    assert f'pipeline_stage_seconds_bucket{{{label},le="0.25"}} 1' in lines
+    assert f'pipeline_stage_seconds_bucket{{{label},le="120.0"}} 1' in lines
+    assert lines[-3:] == [
+        f'pipeline_stage_seconds_bucket{{{label},le="+Inf"}} 1',
+        f"pipeline_stage_seconds_sum{{{label}}} 0.2",
+        f"pipeline_stage_seconds_count{{{label}}} 1",
+    ]
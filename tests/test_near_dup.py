@@ -0,0 +1,92 @@
+import pytest
+
+import near_dup
+from file_storage import StorageManager
+
+LECTURE = "the krebs cycle oxidises acetyl coa to carbon dioxide and releases energy as nadh fadh2 and gtp in the mitochondrial matrix"
+OTHER = "photosynthesis in the chloroplast uses light energy to split water and fix carbon dioxide into sugars through the calvin cycle"
+HEADER = "biology 101 lecture notes spring term department of life sciences"
+
+
+@pytest.fixture
+def storage(tmp_path):
+    s = StorageManager(base_dir=str(tmp_path), reset_db_on_start=False)
+    yield s
+    s.close()
+
+
+def _file(storage, sha, *texts):
+    file_id = storage.save_file_record(f"{sha}.pdf", 1, "", sha)["file_id"]
+    storage.save_chunks(file_id, [{"text": t, "meta": {"chunk_idx": i}} for i, t in enumerate(texts)])
+    return file_id
+
+
+def _dup_of(storage, file_id):
+    rows = storage._conn().execute("SELECT id, dup_of FROM chunks WHERE file_id = ? ORDER BY chunk_idx", (file_id,)).fetchall()
+    return [(r["id"], r["dup_of"]) for r in rows]
+
+
+def test_marks_duplicates_within_a_file(storage):
+    fid = _file(storage, "a", HEADER, LECTURE, HEADER.upper(), OTHER, "Biology 101 - Lecture Notes, Spring Term / Department of Life Sciences")
+    stats = near_dup.dedupe(storage, fid)
+
+    rows = _dup_of(storage, fid)
+    header_id = rows[0][0]
+    assert [d for _, d in rows] == [None, None, header_id, None, header_id]
+    assert stats == {"checked": 5, "duplicates": 2, "within_file": 2, "cross_file": 0, "dropped": 0}
+    # checked chunks are not looked at again
+    assert near_dup.dedupe(storage, fid)["checked"] == 0
+
+
+def test_marks_duplicates_across_files(storage):
+    first = _file(storage, "a", LECTURE, HEADER)
+    near_dup.dedupe(storage, first)
+    second = _file(storage, "b", OTHER, LECTURE)
+    stats = near_dup.dedupe(storage, second)
+
+    assert [d for _, d in _dup_of(storage, second)] == [None, _dup_of(storage, first)[0][0]]
+    assert stats["cross_file"] == 1 and stats["within_file"] == 0
+    assert [c["text"] for c in storage.query_chunks_by_file(second, skip_duplicates_in=[first, second])] == [OTHER]
+
+
+def test_drop_deletes_only_duplicates_within_the_file(storage):
+    first = _file(storage, "a", LECTURE)
+    near_dup.dedupe(storage, first)
+    second = _file(storage, "b", HEADER, LECTURE, OTHER, HEADER)
+    stats = near_dup.dedupe(storage, second, drop=True)
+
+    assert stats["dropped"] == 1 and stats["cross_file"] == 1
+    assert [c["text"] for c in storage.query_chunks_by_file(second)] == [HEADER, LECTURE, OTHER]
+
+
+def test_threshold_is_inclusive(tmp_path):
+    words = LECTURE.split()
+    edited = " ".join(words[:16] + ["glycolysis"] + words[17:])
+    sim = near_dup.similarity(near_dup.signature(LECTURE), near_dup.signature(edited))
+    assert 0.5 < sim < 1
+
+    for threshold, marked in ((sim, True), (sim + 1 / near_dup.NUM_PERM, False)):
+        s = StorageManager(base_dir=str(tmp_path / str(marked)), reset_db_on_start=False)
+        try:
+            fid = _file(s, "a", LECTURE, edited)
+            assert near_dup.dedupe(s, fid, threshold=threshold)["duplicates"] == int(marked)
+        finally:
+            s.close()
+
+
+def test_deleting_the_canonical_chunk_rechecks_its_duplicates(storage):
+    first = _file(storage, "a", LECTURE)
+    near_dup.dedupe(storage, first)
+    second = _file(storage, "b", LECTURE)
+    near_dup.dedupe(storage, second)
+    assert _dup_of(storage, second)[0][1] is not None
+
+    storage.delete_chunks(first)
+    assert _dup_of(storage, second)[0][1] is None
+    assert storage.chunks_missing_minhash() == [(_dup_of(storage, second)[0][0], second, LECTURE)]
+
+    # the former duplicate becomes canonical, so a new copy collapses into it
+    assert near_dup.dedupe(storage)["duplicates"] == 0
+    third = _file(storage, "c", LECTURE)
+    near_dup.dedupe(storage, third)
+    assert _dup_of(storage, third)[0][1] == _dup_of(storage, second)[0][0]
@@ -0,0 +1,33 @@
+import os
+import subprocess
+
+import fitz
+
+import resource_intake
+from resource_intake import ResourceIntake
+
+
+def _blank_pdf(path, n_pages):
+    doc = fitz.open()
+    for _ in range(n_pages):
+        doc.new_page()
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_pooled_ocr_limits_tesseract_threads_per_call(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_run(cmd, input, capture_output, env):
+        calls.append(env)
+        assert input.startswith(b"\x89PNG")
+        return subprocess.CompletedProcess(cmd, 0, stdout=f"page text {len(calls)}".encode(), stderr=b"")
+
+    monkeypatch.delenv("OMP_THREAD_LIMIT", raising=False)
+    monkeypatch.setattr(resource_intake.subprocess, "run", fake_run)
+    chunks = ResourceIntake.extract_pdf(_blank_pdf(tmp_path / "scan.pdf", 3), ocr_workers=2, ocr_dpi=20)
+
+    assert [c["meta"]["page"] for c in chunks] == [1, 2, 3]
+    assert len(calls) == 3 and all(env["OMP_THREAD_LIMIT"] == "1" for env in calls)
+    assert "OMP_THREAD_LIMIT" not in os.environ
@@ -0,0 +1,52 @@
+import random
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, Stage
+
+
+def _jitter(x):
+    time.sleep(random.random() / 200)
+    return x
+
+
+def test_results_come_back_in_input_order():
+    pipe = Pipeline([Stage("a", _jitter, 4), Stage("b", lambda x: x * 2, 3)], queue_size=2)
+    assert pipe.run(list(range(50))) == [(i * 2, None) for i in range(50)]
+
+
+def test_ordered_stage_sees_items_in_input_order():
+    seen = []
+    lock = threading.Lock()
+
+    def record(x):
+        with lock:
+            seen.append(x)
+        return x
+
+    # odd items are dropped upstream; the ordered stage must not wait for them
+    first = Stage("first", lambda x: _jitter(x) if x % 2 == 0 else None, 4)
+    pipe = Pipeline([first, Stage("ordered", record, 2, ordered=True)], queue_size=2)
+    results = pipe.run(list(range(40)))
+    assert seen == list(range(0, 40, 2))
+    assert [r for r, _ in results] == [x if x % 2 == 0 else None for x in range(40)]
+
+
+def test_failed_item_does_not_stop_the_others():
+    def boom(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    pipe = Pipeline([Stage("boom", boom, 2), Stage("ordered", _jitter, 2, ordered=True)])
+    results = pipe.run(list(range(6)))
+    assert [r for r, _ in results] == [0, 1, 2, None, 4, 5]
+    assert isinstance(results[3][1], ValueError)
+    assert pipe.stats()[0]["errors"] == 1
+
+
+def test_needs_a_stage():
+    with pytest.raises(ValueError):
+        Pipeline([])
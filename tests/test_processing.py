@@ -0,0 +1,75 @@
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from docx import Document
+
+import processing
+from file_storage import StorageManager
+
+
+def _docx(path, paragraphs):
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    doc.save(str(path))
+    return str(path)
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    s = StorageManager(base_dir=str(tmp_path / "data"), reset_db_on_start=False)
+    monkeypatch.setattr(processing, "storage", s)
+    yield s
+    s.close()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_identical_files_in_one_batch_are_stored_once(tmp_path, storage, workers):
+    a = _docx(tmp_path / "a.docx", [f"paragraph {i} " + "word " * 150 for i in range(5)])
+    b = str(tmp_path / "b.docx")
+    shutil.copy(a, b)
+    c = _docx(tmp_path / "c.docx", ["something else entirely"])
+
+    results = processing.process_file_paths([a, b, c], workers=workers)
+
+    assert [r.get("error") for r in results] == [None, None, None]
+    assert results[0]["file_id"] == results[1]["file_id"] != results[2]["file_id"]
+    assert results[0]["chunks_extracted"] == results[1]["chunks_extracted"]
+    assert storage.count_chunks(results[0]["file_id"]) == results[0]["chunks_extracted"]
+
+
+def test_progress_reports_every_path(tmp_path, storage):
+    a = _docx(tmp_path / "a.docx", ["some text"])
+    b = str(tmp_path / "b.docx")
+    shutil.copy(a, b)
+    seen = []
+    processing.process_file_paths([a, b], on_progress=lambda done, total, path, res: seen.append((done, total, os.path.basename(path))))
+    assert seen == [(1, 2, "a.docx"), (2, 2, "b.docx")]
+
+
+def test_import_does_not_reset_database(tmp_path, storage):
+    a = _docx(tmp_path / "a.docx", ["kept across imports"])
+    file_id = processing.process_file_path(a)["file_id"]
+    # what a spawned pool worker does: re-import the module, here without STORAGE_PERSIST
+    root = os.path.dirname(os.path.abspath(processing.__file__))
+    env = dict(os.environ, STORAGE_PERSIST="0", PYTHONPATH=root)
+    subprocess.run([sys.executable, "-c", "import processing"], cwd=str(tmp_path), env=env, check=True)
+    assert storage.count_chunks(file_id) == 1
+
+
+def test_concurrent_identical_uploads_keep_their_chunks(tmp_path, storage):
+    a = _docx(tmp_path / "a.docx", [f"paragraph {i} " + "word " * 150 for i in range(8)])
+    paths = [a]
+    for i in range(5):
+        paths.append(str(tmp_path / f"copy{i}.docx"))
+        shutil.copy(a, paths[-1])
+    with ThreadPoolExecutor(max_workers=len(paths)) as pool:
+        results = list(pool.map(processing.process_file_path, paths))
+    file_ids = {r["file_id"] for r in results}
+    assert len(file_ids) == 1
+    assert sum(not r.get("reused") for r in results) == 1
+    assert storage.count_chunks(file_ids.pop()) == results[0]["chunks_extracted"]
@@ -0,0 +1,120 @@
+import email.utils
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+import rate_limit
+from rate_limit import RateLimiter
+
+
+def _http_error(status, retry_after=None):
+    headers = {"retry-after": retry_after} if retry_after is not None else {}
+    request = httpx.Request("POST", "https://example.invalid/v1/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return httpx.HTTPStatusError(f"{status}", request=request, response=response)
+
+
+def _flaky(*errors, result="ok"):
+    errors = list(errors)
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return fn
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(rate_limit.time, "sleep", slept.append)
+    return slept
+
+
+def test_transient_errors_are_retried(sleeps):
+    limiter = RateLimiter(backoff_base_s=0.5, backoff_max_s=4)
+    assert limiter.call(_flaky(_http_error(503), httpx.ConnectError("reset"), TimeoutError())) == "ok"
+
+    stats = limiter.stats()
+    assert (stats["calls"], stats["retries"], stats["failures"]) == (1, 3, 0)
+    # full jitter under a doubling cap
+    assert [d <= cap for d, cap in zip(sleeps, (0.5, 1, 2))] == [True] * 3
+
+
+def test_gives_up_after_max_retries_and_on_client_errors(sleeps):
+    limiter = RateLimiter(max_retries=2, backoff_base_s=0)
+    with pytest.raises(httpx.HTTPStatusError):
+        limiter.call(_flaky(*[_http_error(500)] * 3))
+    with pytest.raises(httpx.HTTPStatusError):
+        limiter.call(_flaky(_http_error(400)))
+    with pytest.raises(ValueError):
+        limiter.call(_flaky(ValueError("bad prompt")))
+    assert limiter.stats()["retries"] == 2 and limiter.stats()["failures"] == 3
+    assert limiter._in_flight == 0
+
+
+def test_retry_after_sets_the_minimum_delay(sleeps):
+    limiter = RateLimiter(backoff_base_s=0.01, backoff_max_s=60)
+    t0 = time.monotonic()
+    assert limiter.call(_flaky(_http_error(429, "0.3"))) == "ok"
+
+    assert sleeps[0] >= 0.3
+    # everyone pauses, the retry included, not only the caller's own sleep
+    assert time.monotonic() - t0 >= 0.25
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_retry_after_http_date():
+    header = email.utils.formatdate(time.time() + 30, usegmt=True)
+    retryable, status, retry_after = rate_limit.classify(_http_error(503, header))
+    assert retryable and status == 503 and 28 <= retry_after <= 30
+    assert rate_limit.classify(_http_error(503, "soon"))[2] is None
+
+
+def test_retry_after_is_capped(sleeps):
+    limiter = RateLimiter(backoff_base_s=0, backoff_max_s=3)
+    limiter.call(_flaky(_http_error(503, "3600")))
+    assert sleeps == [3]
+
+
+def test_concurrency_halves_on_429_and_grows_back(sleeps):
+    limiter = RateLimiter(max_concurrency=8, backoff_base_s=0, recover_after=3, cut_cooldown_s=0)
+    limiter.call(_flaky(_http_error(429), _http_error(429)))
+    assert limiter.concurrency == 2
+
+    # the call that finally succeeded starts the streak
+    limiter.call(_flaky())
+    limiter.call(_flaky())
+    assert limiter.concurrency == 3
+    for _ in range(3 * 3):
+        limiter.call(_flaky())
+    assert limiter.concurrency == 6
+
+
+def test_a_burst_of_429s_cuts_concurrency_once(sleeps):
+    limiter = RateLimiter(max_concurrency=8, backoff_base_s=0, cut_cooldown_s=60)
+    for _ in range(4):
+        limiter.on_throttle(None)
+    assert limiter.concurrency == 4 and limiter.stats()["throttled"] == 4
+
+
+def test_concurrency_limit_is_enforced():
+    limiter = RateLimiter(max_concurrency=2)
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def fn():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        assert list(pool.map(lambda _: limiter.call(fn), range(12))) == ["ok"] * 12
+    assert peak[0] == 2
@@ -0,0 +1,78 @@
+import multiprocessing as mp
+import sqlite3
+
+import file_storage
+from file_storage import MIGRATIONS, StorageManager
+
+
+def _legacy_db(base_dir):
+    """A database as the schema looked before any migration (user_version 0)."""
+    base_dir.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(base_dir / "storage.db"))
+    conn.executescript(
+        """
+        CREATE TABLE files (id INTEGER PRIMARY KEY, original_name TEXT, stored_name TEXT, content_type TEXT, size INTEGER, uploaded_at REAL);
+        CREATE TABLE chunks (id INTEGER PRIMARY KEY, file_id INTEGER, chunk_idx INTEGER, text TEXT, meta_json TEXT);
+        CREATE TABLE summaries (id INTEGER PRIMARY KEY, file_id INTEGER, summary_text TEXT, created_at REAL);
+        INSERT INTO files (original_name, size) VALUES ('old.pdf', 1);
+        INSERT INTO chunks (file_id, chunk_idx, text, meta_json) VALUES (1, 0, 'legacy chunk text', '{}');
+        """
+    )
+    conn.commit()
+    conn.close()
+
+
+def _open(base_dir):
+    StorageManager(base_dir=base_dir, reset_db_on_start=False).close()
+
+
+def test_legacy_database_is_migrated_to_latest(tmp_path):
+    _legacy_db(tmp_path)
+    storage = StorageManager(base_dir=str(tmp_path), reset_db_on_start=False)
+    assert storage.schema_version() == MIGRATIONS[-1][0]
+    assert [c["text"] for c in storage.query_chunks_by_file(1)] == ["legacy chunk text"]
+    assert [h["text"] for h in storage.search_chunks("legacy")] == ["legacy chunk text"]
+    assert storage.find_file_by_hash("nope") is None
+
+
+def test_half_migrated_database_recovers(tmp_path):
+    # a run that died inside migration 4: one column added, user_version still 3
+    _legacy_db(tmp_path)
+    conn = sqlite3.connect(str(tmp_path / "storage.db"))
+    conn.row_factory = sqlite3.Row
+    for version, migration in MIGRATIONS[:3]:
+        migration(conn.cursor())
+        conn.execute(f"PRAGMA user_version = {version}")
+    conn.execute("ALTER TABLE files ADD COLUMN content_sha256 TEXT")
+    conn.commit()
+    conn.close()
+
+    storage = StorageManager(base_dir=str(tmp_path), reset_db_on_start=False)
+    assert storage.schema_version() == MIGRATIONS[-1][0]
+
+
+def test_concurrent_opens_migrate_once(tmp_path):
+    _legacy_db(tmp_path)
+    ctx = mp.get_context("spawn")
+    procs = [ctx.Process(target=_open, args=(str(tmp_path),)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(60)
+    assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+    assert StorageManager(base_dir=str(tmp_path), reset_db_on_start=False).schema_version() == MIGRATIONS[-1][0]
+
+
+def test_failed_migration_rolls_back(tmp_path, monkeypatch):
+    def _broken(c):
+        c.execute("CREATE TABLE half_done (x INTEGER)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(file_storage, "MIGRATIONS", MIGRATIONS + [(99, _broken)])
+    try:
+        StorageManager(base_dir=str(tmp_path), reset_db_on_start=False)
+    except RuntimeError:
+        pass
+    conn = sqlite3.connect(str(tmp_path / "storage.db"))
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == MIGRATIONS[-1][0]
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
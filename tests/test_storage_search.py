@@ -0,0 +1,59 @@
+import pytest
+
+from file_storage import StorageManager
+
+
+@pytest.fixture
+def storage(tmp_path):
+    s = StorageManager(base_dir=str(tmp_path), reset_db_on_start=False)
+    yield s
+    s.close()
+
+
+def _chunks(*texts):
+    return [{"text": t, "meta": {"source": "notes.pdf", "page": i + 1, "chunk_idx": i}} for i, t in enumerate(texts)]
+
+
+def _file(storage, sha, *texts):
+    file_id = storage.save_file_record("notes.pdf", 1, "", sha)["file_id"]
+    storage.save_chunks(file_id, _chunks(*texts))
+    return file_id
+
+
+def _check_index(storage):
+    # raises if the external-content index disagrees with the chunks table
+    storage._conn().execute("INSERT INTO chunks_fts(chunks_fts, rank) VALUES ('integrity-check', 1)")
+
+
+def test_saved_chunks_are_searchable(storage):
+    file_id = _file(storage, "a", "photosynthesis converts light", "mitochondria make energy")
+    hits = storage.search_chunks("photosynthesis")
+    assert [(h["file_id"], h["chunk_idx"], h["meta"]["page"]) for h in hits] == [(file_id, 0, 1)]
+    assert "[photosynthesis]" in hits[0]["snippet"]
+    _check_index(storage)
+
+
+def test_index_covers_every_batch(storage):
+    file_id = storage.save_file_record("big.pdf", 1, "", "a")["file_id"]
+    storage.save_chunks(file_id, _chunks(*[f"entry {i} mentions glucose" for i in range(25)]), batch_size=4)
+    assert len(storage.search_chunks("glucose", limit=100)) == 25
+    _check_index(storage)
+
+
+def test_deleting_chunks_updates_the_index(storage):
+    keep = _file(storage, "a", "osmosis in plant cells")
+    drop = _file(storage, "b", "osmosis in animal cells")
+    storage.delete_chunks(drop)
+    storage.save_chunks(drop, _chunks("diffusion in animal cells"))
+    assert [h["file_id"] for h in storage.search_chunks("osmosis")] == [keep]
+    assert [h["file_id"] for h in storage.search_chunks("diffusion")] == [drop]
+    _check_index(storage)
+    storage.clear()
+    assert storage.search_chunks("osmosis cells") == []
+    _check_index(storage)
+
+
+def test_free_text_query_cannot_break_fts_syntax(storage):
+    _file(storage, "a", "the cell \"membrane\" AND wall")
+    assert storage.search_chunks('"membrane AND (wall') != []
+    assert storage.search_chunks("   ") == []
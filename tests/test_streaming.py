@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+import info_sum
+from llm_cache import LLMCache
+
+
+def _chunk(content, choices=True):
+    if not choices:
+        return SimpleNamespace(choices=[])
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+class FakeClient:
+    def __init__(self, pieces, fail_after=None):
+        self.pieces = pieces
+        self.fail_after = fail_after
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self._chunks()
+
+    def _chunks(self):
+        yield _chunk(None, choices=False)
+        for i, piece in enumerate(self.pieces):
+            if i == self.fail_after:
+                raise ConnectionError("stream reset")
+            yield _chunk(piece)
+            yield _chunk(None)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    c = LLMCache(base_dir=str(tmp_path))
+    monkeypatch.setattr(info_sum, "_cache", c)
+    monkeypatch.setattr(info_sum, "CACHE_ENABLED", True)
+    # the Hugging Face client path
+    monkeypatch.setattr(info_sum, "DEFAULT_BACKEND", "hf", raising=False)
+    return c
+
+
+def _use(monkeypatch, client):
+    monkeypatch.setattr(info_sum, "get_client", lambda: client)
+
+
+def test_stream_yields_every_delta_in_order(cache, monkeypatch):
+    client = FakeClient(["# Notes", "\n- first", "", " point", "\n- ünïcode ✓"])
+    _use(monkeypatch, client)
+
+    pieces = list(info_sum.summarize_text("slide text", stream=True))
+
+    assert pieces == ["# Notes", "\n- first", " point", "\n- ünïcode ✓"]
+    assert client.requests[0]["stream"] is True
+    # the assembled response is cached and served whole next time
+    assert list(info_sum.summarize_text("slide text", stream=True)) == ["".join(pieces)]
+    assert info_sum.summarize_text("slide text") == "".join(pieces)
+    assert len(client.requests) == 1
+
+
+def test_incomplete_streams_are_not_cached(cache, monkeypatch):
+    _use(monkeypatch, FakeClient(["a", "b", "c"], fail_after=2))
+    stream = info_sum.summarize_text("text one", stream=True)
+    assert next(stream) == "a"
+    assert next(stream) == "b"
+    with pytest.raises(ConnectionError):
+        next(stream)
+
+    _use(monkeypatch, FakeClient(["a", "b", "c"]))
+    stream = info_sum.summarize_text("text two", stream=True)
+    assert next(stream) == "a"
+    stream.close()
+
+    assert cache.stats()["entries"] == 0
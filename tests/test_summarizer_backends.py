@@ -0,0 +1,34 @@
+import pytest
+
+from summarizer_backends import LocalTransformersBackend, StubBackend, SummarizerBackend, create_backend
+
+
+def test_backend_must_implement_complete():
+    class Incomplete(SummarizerBackend):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_stream_and_batch_fall_back_to_complete():
+    class Echo(SummarizerBackend):
+        def complete(self, messages, *, max_tokens, temperature):
+            return messages[-1]["content"].upper()
+
+    msgs = [{"role": "user", "content": "hi"}]
+    assert list(Echo().stream(msgs, max_tokens=5, temperature=0)) == ["HI"]
+    assert Echo().complete_batch([msgs, msgs], max_tokens=5, temperature=0) == ["HI", "HI"]
+
+
+def test_local_backend_requires_a_local_model_directory(tmp_path):
+    with pytest.raises(ValueError, match="SUMMARIZER_LOCAL_MODEL"):
+        LocalTransformersBackend(model=None)
+    with pytest.raises(ValueError, match="local model directory"):
+        LocalTransformersBackend(model="Qwen/Qwen2.5-0.5B-Instruct")
+
+
+def test_unknown_backend():
+    assert isinstance(create_backend("stub"), StubBackend)
+    with pytest.raises(ValueError, match="unknown SUMMARIZER_BACKEND"):
+        create_backend("nope")
@@ -0,0 +1,55 @@
+import pytest
+from docx import Document
+
+import connector
+import processing
+from file_storage import StorageManager
+
+
+def _fake_summarize(text, **kwargs):
+    return f"summary of {len(text.split())} words"
+
+
+@pytest.fixture
+def file_id(tmp_path, monkeypatch):
+    monkeypatch.setattr(connector, "summarize_text", _fake_summarize)
+    s = StorageManager(base_dir=str(tmp_path / "data"), reset_db_on_start=False)
+    monkeypatch.setattr(processing, "storage", s)
+    monkeypatch.setattr(connector, "storage", s)
+    doc = Document()
+    for i in range(6):
+        doc.add_paragraph(f"topic {i} " + "word " * 300)
+    doc.save(str(tmp_path / "notes.docx"))
+    yield processing.process_file_path(str(tmp_path / "notes.docx"))["file_id"]
+    s.close()
+
+
+def _summarize(file_id):
+    return connector.summarize_file(file_id, batch_words=400, extractive_ratio=None)
+
+
+def test_summary_with_failed_batch_is_not_reused(file_id, monkeypatch):
+    real = connector.summarize_text
+
+    def flaky(text, **kwargs):
+        if "topic 2" in text:
+            raise RuntimeError("upstream 503")
+        return real(text, **kwargs)
+
+    monkeypatch.setattr(connector, "summarize_text", flaky)
+    first = _summarize(file_id)
+    assert first["failed"] == 1
+    assert first["summary_id"] is None
+
+    monkeypatch.setattr(connector, "summarize_text", real)
+    second = _summarize(file_id)
+    assert not second.get("reused")
+    assert second["failed"] == 0 and second["summary_id"] is not None
+    assert _summarize(file_id)["reused"]
+
+
+def test_summary_is_not_reused_across_models(file_id, monkeypatch):
+    assert _summarize(file_id)["summary_id"] is not None
+    assert _summarize(file_id)["reused"]
+    monkeypatch.setattr(connector, "model_identity", lambda: ("other/model", "other"))
+    assert not _summarize(file_id).get("reused")
@@ -0,0 +1,32 @@
+import pytest
+
+import connector
+
+
+@pytest.fixture(autouse=True)
+def fake_llm(monkeypatch):
+    monkeypatch.setattr(connector, "summarize_text", lambda text, **kwargs: f"summary of {len(text.split())} words")
+
+
+def _texts(n):
+    return [f"chunk {i} " + "word " * 200 for i in range(n)]
+
+
+def _tree(**kwargs):
+    stats = {}
+    connector.summarize_large_text(_texts(40), batch_words=500, max_workers=2, stats=stats, **kwargs)
+    return {k: stats[k] for k in ("levels", "depth", "fan_in")}
+
+
+def test_default_tree():
+    # 20 batches, grouped 8 at a time, then the root
+    assert _tree() == {"levels": [20, 3, 1], "depth": 2, "fan_in": connector.DEFAULT_TREE_FAN_IN}
+
+
+@pytest.mark.parametrize("max_depth, levels", [(1, [20, 1]), (2, [20, 7, 1])])
+def test_max_depth_merges_the_rest_at_the_last_level(max_depth, levels):
+    assert _tree(fan_in=3, max_depth=max_depth) == {"levels": levels, "depth": max_depth, "fan_in": 3}
+
+
+def test_stats_record_the_fan_in_actually_used():
+    assert _tree(fan_in=1) == {"levels": [20, 10, 5, 3, 2, 1], "depth": 5, "fan_in": 2}
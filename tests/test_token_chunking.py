@@ -0,0 +1,42 @@
+from tokenizers import Tokenizer
+from tokenizers.models import WordLevel
+from tokenizers.pre_tokenizers import Whitespace
+
+import resource_intake
+import token_budget
+from resource_intake import ResourceIntake
+
+
+def test_chunks_are_sized_by_tokens_when_a_tokenizer_is_configured(tmp_path, monkeypatch):
+    vocab = {"[UNK]": 0, ".": 1}
+    tok = Tokenizer(WordLevel(vocab, unk_token="[UNK]"))
+    tok.pre_tokenizer = Whitespace()
+    path = tmp_path / "tokenizer.json"
+    tok.save(str(path))
+
+    text = " ".join(f"Sentence number {i} has seven tokens." for i in range(40))
+    word_chunks = ResourceIntake.simple_chunker(text, max_words=200, overlap=0)
+
+    monkeypatch.setenv("TOKENIZER_PATH", str(path))
+    monkeypatch.setattr(token_budget, "TOKENIZER_PATH", str(path))
+    monkeypatch.setattr(token_budget, "_tokenizer", None)
+    monkeypatch.setattr(resource_intake, "CHUNK_TOKENS", 50)
+    token_chunks = ResourceIntake.simple_chunker(text, max_words=200, overlap=0)
+
+    assert len(word_chunks) == 2
+    assert len(token_chunks) == 6
+    assert all(token_budget.count_tokens(c) <= 50 for c in token_chunks)
+    assert " ".join(token_chunks) == text
+
+
+def test_bad_tokenizer_path_is_tried_once(tmp_path, monkeypatch, caplog):
+    bad = tmp_path / "missing.json"
+    monkeypatch.setenv("TOKENIZER_PATH", str(bad))
+    monkeypatch.setattr(token_budget, "TOKENIZER_PATH", str(bad))
+    monkeypatch.setattr(token_budget, "_tokenizer", None)
+    text = "One sentence here. Another one there."
+    with caplog.at_level("WARNING", logger="token_budget"):
+        for _ in range(3):
+            assert ResourceIntake.simple_chunker(text) == [text]
+        assert token_budget.get_tokenizer() is None
+    assert len([r for r in caplog.records if "Failed to load tokenizer" in r.getMessage()]) == 1
@@ -0,0 +1,118 @@
+'''
+Token counting and packing for chunks and LLM batches.
+Uses a locally stored tokenizer.json (TOKENIZER_PATH) loaded with the `tokenizers` package.
+'''
+
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+from tokenizers import Tokenizer
+
+from resource_intake import ResourceIntake
+
+logger = logging.getLogger(__name__)
+
+# tokenizer.json of the summarizer model (or a close relative), stored locally
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", None)
+
+# context window of the deployed model; batches are packed to fit inside it
+CONTEXT_TOKENS = int(os.getenv("SUMMARIZER_CONTEXT_TOKENS", "8192"))
+
+# chat template, role markers and the "Summarize the following chunks" preamble
+PROMPT_OVERHEAD_TOKENS = 64
+
+# not loaded yet; a failed load is remembered as _FAILED so it is tried and reported once
+_FAILED = object()
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+
+def get_tokenizer() -> Optional[Tokenizer]:
+    """The shared tokenizer, or None when TOKENIZER_PATH is unset or unreadable."""
+    global _tokenizer
+    if _tokenizer is None and TOKENIZER_PATH:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                try:
+                    _tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+                except Exception as e:
+                    logger.warning("Failed to load tokenizer from %s (%s); counting words instead", TOKENIZER_PATH, e)
+                    _tokenizer = _FAILED
+    return None if _tokenizer is _FAILED else _tokenizer
+
+
+def count_tokens_batch(texts: List[str], tokenizer: Optional[Tokenizer] = None) -> List[int]:
+    tokenizer = tokenizer or get_tokenizer()
+    if tokenizer is None:
+        raise RuntimeError("No tokenizer available. Set TOKENIZER_PATH to a local tokenizer.json")
+    if not texts:
+        return []
+    return [len(e.ids) for e in tokenizer.encode_batch_fast(texts, add_special_tokens=False)]
+
+
+def count_tokens(text: str, tokenizer: Optional[Tokenizer] = None) -> int:
+    return count_tokens_batch([text], tokenizer)[0]
+
+
+def batch_token_budget(system_prompt: str, max_tokens: int, context_tokens: int = CONTEXT_TOKENS, tokenizer: Optional[Tokenizer] = None) -> int:
+    """Input tokens left for the batch text once the system prompt and the completion are reserved."""
+    budget = context_tokens - count_tokens(system_prompt, tokenizer) - max_tokens - PROMPT_OVERHEAD_TOKENS
+    if budget <= 0:
+        raise ValueError(f"context of {context_tokens} tokens leaves no room for input with max_tokens={max_tokens}")
+    return budget
+
+
+def pack_by_tokens(texts: List[str], max_tokens: int, sep: str = "\n\n", tokenizer: Optional[Tokenizer] = None, boundary: Optional[Callable[[str], bool]] = None) -> List[str]:
+    """
+    Greedily join texts (in order) into batches of at most max_tokens tokens.
+    A single text larger than the budget becomes its own batch.
+    boundary(text) -> True also closes a batch after text once it is half full.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    counts = count_tokens_batch(texts, tokenizer)
+    sep_tokens = count_tokens(sep, tokenizer) if sep else 0
+    batches = []
+    cur: List[str] = []
+    cur_tokens = 0
+    for t, n in zip(texts, counts):
+        extra = n + (sep_tokens if cur else 0)
+        if cur_tokens + extra <= max_tokens or not cur:
+            cur.append(t)
+            cur_tokens += extra
+        else:
+            batches.append(sep.join(cur))
+            cur = [t]
+            cur_tokens = n
+        if boundary is not None and cur_tokens * 2 >= max_tokens and boundary(t):
+            batches.append(sep.join(cur))
+            cur = []
+            cur_tokens = 0
+    if cur:
+        batches.append(sep.join(cur))
+    return batches
+
+
+def chunk_text_by_tokens(text: str, max_tokens: int = 256, overlap_sentences: int = 0, tokenizer: Optional[Tokenizer] = None) -> List[str]:
+    """Token-sized counterpart of ResourceIntake.chunk_text: sentence-aligned chunks of <= max_tokens."""
+    sentences = ResourceIntake._sentence_split(text)
+    if not sentences:
+        return []
+    counts = count_tokens_batch(sentences, tokenizer)
+    chunks: List[str] = []
+    cur: List[int] = []  # sentence indices in the current chunk
+    cur_tokens = 0
+    for i, n in enumerate(counts):
+        if cur_tokens + n <= max_tokens or not cur:
+            cur.append(i)
+            cur_tokens += n
+        else:
+            chunks.append(" ".join(sentences[j] for j in cur).strip())
+            cur = cur[-overlap_sentences:] if overlap_sentences and overlap_sentences < len(cur) else []
+            cur_tokens = sum(counts[j] for j in cur)
+            cur.append(i)
+            cur_tokens += n
+    if cur:
+        chunks.append(" ".join(sentences[j] for j in cur).strip())
+    return chunks